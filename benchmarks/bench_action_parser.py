@@ -0,0 +1,79 @@
+"""
+Compares the regex action parser of GPTRobot with the substring scans it replaced,
+on typical model answers: time per answer, answers that needed a retry and answers
+dispatched to the wrong call. Run from the repository root:
+    python benchmarks/bench_action_parser.py
+"""
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from abstract_robot.action_parser import ActionParseError, parse
+
+# (answer of the model, expected call or None if the model has to be asked again)
+ANSWERS = [
+    ("I will first look around to find the keys.\nEXPLORE()", "EXPLORE()"),
+    ("KeyA is in the main room, I move there to pick it up.\nMOVETO(KeyA)", "MOVETO(KeyA)"),
+    ("I am at KeyA so I can pick it up now.\nPICKUP(KeyA)", "PICKUP(KeyA)"),
+    ("With KeyA I can open the door of Room1.\nOPENDOOR(Door_Room1, KeyA)", "OPENDOOR(Door_Room1, KeyA)"),
+    ("I explored already, now I MOVETO the key and after that PICKUP it.\nMOVETO(KeyB)", "MOVETO(KeyB)"),
+    ("Now that the door is open I can PUTDOWN the key later.\nPICKUP(KeyB)", "PICKUP(KeyB)"),
+    ("I put the key next to the table.\nPUTDOWN(KeyB)", "PUTDOWN(KeyB)"),
+    ("The task is done, so the robot is FINISHED.\nFINISHED", "FINISHED()"),
+    ("All objects are in place.\nFINISHED()", "FINISHED()"),
+    ("I'll open the door.\nOPENDOOR('Door_Room2', 'KeyB')", "OPENDOOR(Door_Room2, KeyB)"),
+    ("I have EXPLOREd all open rooms, the table is in Room2.\nMOVETO(Table)", "MOVETO(Table)"),
+    ("Opening the door with the key I hold.\nOPENDOOR(Door_Room1,KeyA)", "OPENDOOR(Door_Room1, KeyA)"),
+    ("I pick up the ball.\nPICKUP (Ball)", "PICKUP(Ball)"),
+    ("First MOVETO(KeyA) then PICKUP(KeyA).", None),
+    ("I am not sure what to do next.", None),
+]
+
+def legacy_parse(message):
+    # the substring scans GPTRobot used before, returns the call or None if it asked again
+    options = ['EXPLORE', 'PICKUP', 'MOVETO', 'PUTDOWN', 'FINISHED']
+    if len([option for option in options if option in message]) > 1:
+        return None
+    message = message.replace("'", "").replace('"', '')
+    try:
+        if "EXPLORE" in message:
+            return "EXPLORE()"
+        if "PICKUP" in message:
+            return f"PICKUP({message.split('PICKUP(')[1].split(')')[0]})"
+        if "MOVETO" in message:
+            return f"MOVETO({message.split('MOVETO(')[1].split(')')[0]})"
+        if "PUTDOWN" in message:
+            return f"PUTDOWN({message.split('PUTDOWN(')[1].split(')')[0]})"
+        if "OPENDOOR" in message:
+            doorname = message.split("OPENDOOR(")[1].split(",")[0]
+            keyname = message.split(f"OPENDOOR({doorname}, ")[1].split(")")[0]
+            return f"OPENDOOR({doorname}, {keyname})"
+        if "FINISHED" in message:
+            return "FINISHED()"
+    except IndexError:
+        return "error"
+    return None
+
+def regex_parse(message):
+    try:
+        return repr(parse(message))
+    except ActionParseError:
+        return None
+
+def evaluate(parser):
+    retries = wrong = 0
+    for answer, expected in ANSWERS:
+        call = parser(answer)
+        if call is None and expected is not None:
+            retries += 1
+        elif call != expected:
+            wrong += 1
+    seconds = timeit.timeit(lambda: [parser(answer) for answer, _ in ANSWERS], number=2000) / (2000 * len(ANSWERS))
+    return {"us_per_answer": seconds * 1e6, "wasted_retries": retries, "wrong_calls": wrong}
+
+if __name__ == "__main__":
+    for name, parser in [("substring", legacy_parse), ("regex", regex_parse)]:
+        result = evaluate(parser)
+        print(f"{name:>10}: {result['us_per_answer']:.2f} us/answer, {result['wasted_retries']} wasted retries, "
+              f"{result['wrong_calls']} wrong calls out of {len(ANSWERS)} answers")
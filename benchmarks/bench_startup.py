@@ -0,0 +1,52 @@
+"""
+Start-up time of the env stack in fresh interpreters: time to import each entry
+point and build a headless episode, and which heavy dependencies got loaded on the
+way (pygame, openai, seaborn...). Run from the repository root:
+    python benchmarks/bench_startup.py
+"""
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+CONFIG = os.path.join(SRC, "..", "configs", "simple_room.yaml")
+HEAVY = ["pygame", "openai", "dotenv", "seaborn", "colorcet", "matplotlib"]
+
+# what each start-up path runs
+CASES = {
+    "import gym_env.utils.core": "import gym_env.utils.core",
+    "import gym_env.simple": "import gym_env.simple",
+    "import abstract_robot.gpt_robot": "import abstract_robot.gpt_robot",
+    "import batch_runner": "import batch_runner",
+    "headless episode": (
+        "from batch_runner import run_episode\n"
+        f"run_episode({{'config': {CONFIG!r}, 'task': 'open room1', 'seed': 0, 'stub': True, 'script': ['EXPLORE()', 'FINISHED']}})"
+    ),
+}
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+exec(compile({code!r}, "<case>", "exec"))
+elapsed = time.perf_counter() - start
+print({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}})
+"""
+
+def measure(code, repeat=5):
+    # median over fresh interpreters, the import caches of the OS are warm after the first run
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", PROBE.format(code=code, heavy=HEAVY)], cwd=SRC,
+                             capture_output=True, text=True, check=True, env={**os.environ, "SDL_VIDEODRIVER": "dummy"})
+        runs.append(eval(out.stdout.strip().splitlines()[-1]))
+    return {"seconds": statistics.median(r["seconds"] for r in runs), "loaded": runs[-1]["loaded"]}
+
+if __name__ == "__main__":
+    results = {name: measure(code) for name, code in CASES.items()}
+    for name, result in results.items():
+        print(f"{name:>32}: {result['seconds']*1e3:7.1f} ms, loaded: {', '.join(result['loaded']) or 'none'}")
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,74 @@
+"""
+Grid moves per second of the agent in World: the allocating `step` it used before,
+the in place `step` and `step_path` applying a whole (T, 2) trajectory in one call
+(collision checks included). Run from the repository root:
+    python benchmarks/bench_step.py
+"""
+import os
+import sys
+import timeit
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from omegaconf import OmegaConf
+from gym_env.utils.core import World
+
+CONFIG = os.path.join(os.path.dirname(__file__), "..", "configs", "simple_room.yaml")
+ACTION_TO_DIRECTION = {
+    0: np.array([1, 0]),
+    1: np.array([0, 1]),
+    2: np.array([-1, 0]),
+    3: np.array([0, -1]),
+}
+
+def legacy_step(world, action):
+    # World.step as it was: dict lookup and a new position array per move
+    if isinstance(action, int):
+        direction = ACTION_TO_DIRECTION[action]
+    else:
+        direction = action
+    world.agent.state.p_pos = np.clip(world.agent.state.p_pos + direction, 0, world.size - 1)
+
+def legacy_goto(world, path):
+    # per waypoint deltas as Agent.goto computed them
+    for xy in [np.array(xy) for xy in path]:
+        legacy_step(world, xy - world.agent.state.p_pos)
+
+def new_goto(world, path):
+    deltas = np.diff(np.array([tuple(world.agent.state.p_pos)] + path), axis=0)
+    for action in deltas:
+        world.step(action)
+
+def steps_per_s(fn, n_steps, number):
+    return n_steps * number / timeit.timeit(fn, number=number)
+
+if __name__ == "__main__":
+    np.random.seed(0)
+    world = World(size=500, wait_time_s=0, cfg=OmegaConf.load(CONFIG), fast_forward=True)
+    agent = world.agent
+    # corner to corner of the main room and back
+    a, b = (1, 251), (498, 498)
+    there, back = world.shortest_path(a, b), world.shortest_path(b, a)
+    deltas = np.diff(np.array([a] + there + back), axis=0)
+
+    def reset():
+        agent.state.p_pos = a
+
+    def run(goto):
+        reset()
+        goto(world, there)
+        goto(world, back)
+
+    def run_path():
+        reset()
+        world.step_path(deltas)
+
+    n = len(deltas)
+    results = {
+        "legacy step": steps_per_s(lambda: run(legacy_goto), n, 20),
+        "step": steps_per_s(lambda: run(new_goto), n, 20),
+        "step_path": steps_per_s(run_path, n, 2000),
+    }
+    print(f"trajectory of {n} moves on a {world.size}x{world.size} grid")
+    for name, rate in results.items():
+        print(f"{name:>12}: {rate:,.0f} steps/s ({rate / results['legacy step']:.1f}x)")
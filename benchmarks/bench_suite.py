@@ -0,0 +1,191 @@
+"""
+Benchmark suite of the env stack: World construction, goto between corner cells,
+open on worlds with many rooms, render frame rate, explore with many entities and
+a whole scripted episode against a StubLLM. Results are printed and saved as JSON,
+with the commit they were measured on, so that versions can be compared:
+    python benchmarks/bench_suite.py --out before.json
+    python benchmarks/bench_suite.py --out after.json --compare before.json
+Run from the repository root, `--quick` runs fewer repetitions.
+"""
+import io
+import os
+import sys
+import json
+import time
+import timeit
+import argparse
+import itertools
+import contextlib
+import platform
+import subprocess
+import numpy as np
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from omegaconf import OmegaConf
+from gym_env.utils.core import World
+from batch_runner import run_episode
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CONFIG = os.path.join(ROOT, "configs", "simple_room.yaml")
+# key-door-object episode of configs/simple_room.yaml
+SCRIPT = ["EXPLORE()", "MOVETO(KeyA)", "PICKUP(KeyA)", "OPENDOOR(Door_Room1, KeyA)", "MOVETO(KeyB)",
+          "PICKUP(KeyB)", "OPENDOOR(Door_Room2, KeyB)", "MOVETO(Table)", "FINISHED"]
+
+def measure(fn, setup=None, repeat=5):
+    """
+    Seconds per call of `fn` (best and median of `repeat` runs). `setup` is run,
+    untimed, before each run of `fn`; without it `fn` is called in loops long
+    enough to be timed reliably.
+    """
+    if setup is None:
+        timer = timeit.Timer(fn)
+        number, _ = timer.autorange()
+        runs = [t / number for t in timer.repeat(repeat, number)]
+    else:
+        runs = []
+        for _ in range(repeat):
+            setup()
+            start = time.perf_counter()
+            fn()
+            runs.append(time.perf_counter() - start)
+    return {"best_s": min(runs), "median_s": float(np.median(runs)), "repeat": repeat}
+
+def many_rooms_config(n_rooms, n_objects=0):
+    # main room with the keys of `n_rooms` rooms, objects spread over the rooms
+    rooms = [{"name": f"Room{i}", "objects": [], "doorkeys": []} for i in range(n_rooms)]
+    for j in range(n_objects):
+        rooms[j % n_rooms]["objects"].append({"name": f"Object{j}"})
+    main = {"name": "main_room", "objects": [], "doorkeys": [{"name": f"Key{i}", "forroom": f"Room{i}"} for i in range(n_rooms)]}
+    return OmegaConf.create({"rooms": [main] + rooms})
+
+def bench_construction(cfg, repeat):
+    return {f"world_construction[size={size}]": measure(lambda: World(size, 0, cfg, fast_forward=True), repeat=repeat)
+            for size in (10, 100, 500)}
+
+def bench_goto(cfg, repeat):
+    # from the top left to the bottom right corner of the main room, planned from scratch or cached
+    results = {}
+    for size in (100, 500):
+        np.random.seed(0)
+        world = World(size, 0, cfg, fast_forward=True)
+        agent, key = world.agent, world.keys["KeyA"]
+        start, corner = (0, size // 2), (size - 1, size - 1)
+        key.state.p_pos = corner
+        world.entities.move(key, room="main_room", cell=corner)
+        def walk():
+            agent.state.p_pos = start
+            agent.goto("KeyA")
+        def cold():
+            world.path_cache.invalidate()
+            walk()
+        results[f"goto_corner[size={size},cold]"] = measure(cold, repeat=repeat)
+        results[f"goto_corner[size={size},cached]"] = measure(walk, repeat=repeat)
+    return results
+
+def bench_open(repeat, n_rooms=50):
+    # opens every room of a world with many rooms, the keys are picked beforehand
+    np.random.seed(0)
+    world = World(500, 0, many_rooms_config(n_rooms), fast_forward=True)
+    agent = world.agent
+    def setup():
+        world.reset(0)
+        for key in world.keys:
+            agent.goto(key)
+            agent.pick(key)
+    def open_all():
+        for i in range(n_rooms):
+            agent.open(f"Door_Room{i}", f"Key{i}")
+    result = measure(open_all, setup=setup, repeat=repeat)
+    result["per_open_s"] = result["median_s"] / n_rooms
+    return {f"open_all[rooms={n_rooms}]": result}
+
+def bench_render(cfg, repeat):
+    # frames per second when nothing changed, when the agent moves and when everything is redrawn
+    np.random.seed(0)
+    world = World(100, 0, cfg, fast_forward=True)
+    world._render_frame()
+    moves = itertools.cycle((0, 2))
+    def moving():
+        world.step(next(moves))
+        world.publish()
+        world._render_frame()
+    def full():
+        world.renderer.invalidate(layout=True)
+        world._render_frame()
+    results = {}
+    for name, fn in [("idle", world._render_frame), ("agent_moving", moving), ("full_redraw", full)]:
+        result = measure(fn, repeat=repeat)
+        result["fps"] = 1 / result["median_s"]
+        results[f"render_frame[{name}]"] = result
+    return results
+
+def bench_explore(repeat, n_objects=2000):
+    # explore after an object was moved (index update and text rebuilt) and repeated (cached)
+    np.random.seed(0)
+    world = World(500, 0, many_rooms_config(20, n_objects), fast_forward=True)
+    agent, some_object = world.agent, world.objects["Object0"]
+    # all rooms are opened as the agent does it so that every entity is listed
+    for room in world.rooms.values():
+        if room.door.open: continue
+        key = room.door.key
+        agent.goto(key.name)
+        agent.pick(key.name)
+        agent.open(room.door.name, key.name)
+    def changed():
+        world.item_moved(some_object)
+        agent.explore()
+    return {
+        f"explore[entities={n_objects + 20},changed]": measure(changed, repeat=repeat),
+        f"explore[entities={n_objects + 20},cached]": measure(agent.explore, repeat=repeat),
+    }
+
+def bench_episode(repeat):
+    # headless key-door-object episode answered by a StubLLM, as batch_runner runs it
+    job = {"config": CONFIG, "task": "put the table in room2", "seed": 0, "stub": True, "script": SCRIPT}
+    assert run_episode(job)["success"], "scripted episode failed"
+    return {"scripted_episode": measure(lambda: run_episode(job), repeat=repeat)}
+
+def fmt(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale: return f"{seconds / scale:,.2f} {unit}"
+    return f"{seconds * 1e9:,.0f} ns"
+
+def commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(results, baseline):
+    # speedup of each benchmark over the baseline (>1 is faster)
+    for name, result in results.items():
+        if name in baseline:
+            print(f"{name:>42}: {baseline[name]['median_s'] / result['median_s']:6.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark suite of the env stack")
+    parser.add_argument("--out", default=None, help="JSON file the results are written to")
+    parser.add_argument("--compare", default=None, help="JSON file of an earlier run to compare to")
+    parser.add_argument("--quick", action="store_true", help="fewer repetitions")
+    args = parser.parse_args()
+    repeat = 3 if args.quick else 7
+
+    cfg = OmegaConf.load(CONFIG)
+    results = {}
+    for bench in [lambda: bench_construction(cfg, repeat), lambda: bench_goto(cfg, repeat), lambda: bench_open(repeat),
+                  lambda: bench_render(cfg, repeat), lambda: bench_explore(repeat), lambda: bench_episode(repeat)]:
+        # episodes print the answers of the model
+        with contextlib.redirect_stdout(io.StringIO()):
+            results.update(bench())
+
+    for name, result in results.items():
+        extra = "".join(f", fps {v:,.0f}" if k == "fps" else f", {fmt(v)} per open" for k, v in result.items() if k in ("fps", "per_open_s"))
+        print(f"{name:>42}: {fmt(result['median_s']):>10} (best {fmt(result['best_s'])}{extra})")
+    if args.out is not None:
+        meta = {"commit": commit(), "python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(), "time": time.time()}
+        with open(args.out, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            compare(results, json.load(f)["results"])
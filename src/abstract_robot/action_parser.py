@@ -0,0 +1,60 @@
+import re
+
+# number of arguments of each API function of the robot
+ARITY = {
+    "EXPLORE": 0,
+    "PICKUP": 1,
+    "MOVETO": 1,
+    "PUTDOWN": 1,
+    "OPENDOOR": 2,
+    "FINISHED": 0,
+}
+
+# an API call is the function name followed by its arguments in brackets. FINISHED
+# may also be called without brackets, but only alone on its line, so that names of
+# functions mentioned in the explanation are not taken as calls
+API_CALL = re.compile(
+    r"\b(?P<name>" + "|".join(ARITY) + r")[ \t]*\((?P<args>[^()\n]*)\)"
+    r"|^[ \t*>`-]*(?P<finished>FINISHED)[ \t.`!]*$",
+    re.MULTILINE,
+)
+
+class ActionParseError(Exception):
+    pass
+
+class ApiCall():
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __eq__(self, other):
+        return isinstance(other, ApiCall) and (self.name, self.args) == (other.name, other.args)
+
+    def __repr__(self):
+        return f"{self.name}({', '.join(self.args)})"
+
+def parse_all(message):
+    """
+    Returns the API calls in the message in order, raises ActionParseError if
+    none is found or if the arguments of a call don't match its function.
+    """
+    calls = []
+    for match in API_CALL.finditer(message):
+        if match.group("finished"):
+            calls.append(ApiCall("FINISHED", []))
+            continue
+        name, args = match.group("name"), match.group("args")
+        args = [arg.strip().strip("'\"` ") for arg in args.split(",")] if args.strip() else []
+        if len(args) != ARITY[name]:
+            raise ActionParseError(f"{name} takes {ARITY[name]} argument(s) but {len(args)} were given in {match.group(0)}")
+        calls.append(ApiCall(name, args))
+    if len(calls) == 0:
+        raise ActionParseError("no API call was found. Call one of " + ", ".join(ARITY))
+    return calls
+
+def parse(message):
+    # returns the single API call in the message (repeating the same call is allowed)
+    calls = parse_all(message)
+    if any(call != calls[0] for call in calls[1:]):
+        raise ActionParseError("more than one API call was found: " + ", ".join(map(repr, calls)))
+    return calls[0]
@@ -1,11 +1,8 @@
-import openai
-from dotenv import load_dotenv
-import os
-load_dotenv()
-try:
-  openai.api_key = open(os.path.dirname(__file__) + '/openai.key', 'r').readline().rstrip()
-except:
-  openai.api_key = os.getenv("OPENAI_API_KEY")
+import asyncio
+from time import perf_counter
+from abstract_robot.llm import OpenAIChat, acomplete
+from abstract_robot.retry import RetryPolicy
+from abstract_robot.action_parser import ActionParseError, parse, parse_all
 
 SYSTEM_PROMPT_FULL = """You are the cognitive center of a robot. This means, you have a task to complete and you can use the given API of the robot to complete the task. The robot will tell you if an API call failed or how it succeeded, so you can react to it.
 The robot acts in 2D, so no need to worry about the height coordinate.
@@ -36,10 +33,40 @@ call FINISHED as soon as you think you're done.
 
 Always make sure to explore everything. Because if you don't you might not be able to complete the task. Only call one API function at a time and provide the argument correctly to within the function."""
 
-class GPTRobot():
-    def __init__(self, task_message, robot_explore, robot_pickup, robot_moveto, robot_putdown, robot_opendoor, finished):
+SYSTEM_PROMPT_PLAN = """You are the cognitive center of a robot. This means, you have a task to complete and you can use the given API of the robot to complete the task. The robot will tell you if an API call failed or how it succeeded, so you can react to it.
+
+The API at your disposal (the call function is in big letters):
+ * EXPLORE()
+ * PICKUP(keyname)
+ * MOVETO(keyname)
+ * PUTDOWN(keyname)
+ * OPENDOOR(doorname, keyname)
+
+call FINISHED as soon as you think you're done.
+
+Always make sure to explore everything. Because if you don't you might not be able to complete the task. You can plan several API calls at once: write each call on its own line, in the order they have to be run. The robot runs them in order and stops at the first one that fails. Provide the arguments correctly to within the functions."""
+
+RETRY_MESSAGE = "Can't process that: {}. Please only call one API function at a time. Please try again and give me only the next API call."
+RETRY_MESSAGE_PLAN = "Can't process that: {}. Please try again and give me the next API calls, each in a new line."
+
+class AsyncGPTRobot():
+    """
+    Robot brain whose `next_action` awaits the model, so that many episodes can
+    run concurrently on one event loop. The robot functions are called synchronously.
+    """
+    def __init__(self, task_message, robot_explore, robot_pickup, robot_moveto, robot_putdown, robot_opendoor, finished, llm=None, retry_policy=None, history=None, plan_mode=False, validate_plan=None, profiler=None):
         self.task_message = task_message
-        self.messages = [
+        # in plan mode the model can answer with several API calls, run in order
+        self.plan_mode = plan_mode
+        # checks a plan, given as [(function name, arguments)], and returns its problem or None
+        self.validate_plan = validate_plan
+        if plan_mode:
+            self.messages = [
+                    {"role": "system", "content": SYSTEM_PROMPT_PLAN},
+                    {"role": "user", "content": "Please complete the following task: " + self.task_message + "\nAlways explain what you are doing and why (without naming the functions explicitely). Then call the API functions of the robot, each in a new line."},
+                ]
+        else:
+            self.messages = [
                     {"role": "system", "content": SYSTEM_PROMPT_SIMPLE},
                     {"role": "user", "content": "Please complete the following task: " + self.task_message + "\nAlways explain what you are doing and why (without naming the functions explicitely). Then in a new line call the API function of the robot. Call one API function at a time."},
                 ]
@@ -49,56 +76,132 @@ class GPTRobot():
         self.robot_putdown = robot_putdown
         self.robot_opendoor = robot_opendoor
         self.finished = finished
+        # robot function called for each API function
+        self.actions = {
+            "EXPLORE": self.robot_explore,
+            "PICKUP": self.robot_pickup,
+            "MOVETO": self.robot_moveto,
+            "PUTDOWN": self.robot_putdown,
+            "OPENDOOR": self.robot_opendoor,
+            "FINISHED": self.finished,
+        }
+        # model called with the messages (OpenAI by default)
+        self.llm = OpenAIChat() if llm is None else llm
+        # how to ask again when the answer can't be processed
+        self.retry_policy = RetryPolicy() if retry_policy is None else retry_policy
+        # HistoryManager compacting the messages sent to the model (all messages are sent if None)
+        self.history = history
+        # records the time of model calls and turns if set (anything with `record(name, start, **fields)`, e.g. a gym_env Profiler)
+        self.profiler = profiler
+        # episode counters
+        self.api_calls = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
 
-    def next_action(self, robot_answer=None):
+    async def next_action(self, robot_answer=None):
+        return await self._next_action(robot_answer)
+
+    def stats(self):
+        return {
+            "api_calls": self.api_calls,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+    async def _complete(self, messages):
+        if self.profiler is not None: start = perf_counter()
+        completion = await acomplete(self.llm, messages)
+        self.api_calls += 1
+        self.prompt_tokens += completion.prompt_tokens
+        self.completion_tokens += completion.completion_tokens
+        if self.profiler is not None:
+            self.profiler.record("llm_call", start, messages=len(messages), prompt_tokens=completion.prompt_tokens, completion_tokens=completion.completion_tokens)
+        return completion
+
+    async def _next_action(self, robot_answer=None):
+        if self.profiler is None:
+            return await self._turn(robot_answer)
+        # the turn includes the model calls and running the robot functions
+        start, before = perf_counter(), self.stats()
+        answer = await self._turn(robot_answer)
+        self.profiler.record("next_action", start, **{key: value - before[key] for key, value in self.stats().items()})
+        return answer
+
+    async def _turn(self, robot_answer=None):
         if robot_answer is not None:
             self.messages.append({"role": "user", "content": robot_answer})
         if self.messages == []:
             bot_answer = "EXPLORE()"
-        completion = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages = self.messages,
-            max_tokens=256,
-        )
-        options = ['EXPLORE', 'PICKUP', 'MOVETO', 'PUTDOWN', 'FINISHED']
-        # if multiple options in completion.choices[0]
-        if len([option for option in options if option in completion.choices[0].message.content])>1:
-            print("retrying becuse multiuple API calls")
-            self.messages.append({"role": "user", "content": "Can't process that. Please only call one API function at a time. Please try again and give me only the next API call."})
-            return self.next_action()
-        message_string = completion.choices[0].message.content
+        # the retry message is only sent along for this turn, it is not kept in the history
+        messages = self.messages if self.history is None else self.history.build(self.messages)
+        prompt = messages
+        for attempt in range(1, self.retry_policy.max_attempts + 1):
+            completion = await self._complete(messages)
+            try:
+                calls = self._parse(completion.content)
+                break
+            except ActionParseError as e:
+                retry_message = (RETRY_MESSAGE_PLAN if self.plan_mode else RETRY_MESSAGE).format(e)
+            if attempt == self.retry_policy.max_attempts:
+                # give up for this turn, the model sees the problem on the next one
+                return retry_message
+            print("retrying because " + retry_message)
+            self.retries += 1
+            messages = prompt + [{"role": "user", "content": retry_message}]
+            await asyncio.sleep(self.retry_policy.delay(attempt))
+        message_string = completion.content
         # replace ' and " with empty string
         message_string = message_string.replace("'", "").replace('"', '')
         self.messages.append({"role": "assistant", "content": message_string})
-        result = self.apply_message(message_string)
-        return result
-    
+        print('\033[91m' + message_string + '\033[0m')
+        return self.run_plan(calls) if self.plan_mode else self.dispatch(calls[0])
+
+    def _parse(self, message_string):
+        # the API calls of an answer of the model, raises ActionParseError if they can't be run
+        if not self.plan_mode:
+            return [parse(message_string)]
+        calls = parse_all(message_string)
+        if self.validate_plan is not None:
+            problem = self.validate_plan([(call.name, call.args) for call in calls])
+            if problem is not None:
+                raise ActionParseError(problem)
+        return calls
+
+    def run_plan(self, calls):
+        """
+        Runs the API calls in order, stopping at the first one that fails (its robot
+        function returns a string marked as `failed` or raises). Returns the answers
+        of the robot for all the calls that were run.
+        """
+        results = []
+        for i, call in enumerate(calls):
+            try:
+                result = self.dispatch(call)
+                failed = getattr(result, "failed", False)
+            except Exception as e:
+                result, failed = f"{call!r} could not be run ({e!r})", True
+            results.append(f"{i+1}. {call!r}: {result}")
+            if failed:
+                results.append(f"Stopped at step {i+1}, the remaining {len(calls)-i-1} API calls were not run.")
+                break
+        return "\n".join(str(r) for r in results)
+
     def apply_message(self, message_string):
         print('\033[91m' + message_string + '\033[0m')
-        if "EXPLORE" in message_string:
-            # EXPLORE(roomname), extract roomname
-            # roomname = message_string.split("EXPLORE(")[1].split(")")[0]
-            return self.robot_explore()
-        if "PICKUP" in message_string:
-            # PICKUP(objectname), extract objectname
-            objectname = message_string.split("PICKUP(")[1].split(")")[0]
-            return self.robot_pickup(objectname)
-        if "MOVETO" in message_string:
-            # MOVETO(objectname or roomname or doorname), extract objectname
-            objectname = message_string.split("MOVETO(")[1].split(")")[0]
-            return self.robot_moveto(objectname)
-        if "PUTDOWN" in message_string:
-            # PUTDOWN(objectname), extract objectname
-            objectname = message_string.split("PUTDOWN(")[1].split(")")[0]
-            return self.robot_putdown(objectname)
-        if "OPENDOOR" in message_string:
-            # OPENDOOR(objectname), extract objectname
-            doorname = message_string.split("OPENDOOR(")[1].split(",")[0]
-            keyname = message_string.split(f"OPENDOOR({doorname}, ")[1].split(")")[0]
-            return self.robot_opendoor(doorname, keyname)
-        if "FINISHED" in message_string:
-            return self.finished()
-        else:
-            print("ERROR: unknown message: " + message_string)
+        try:
+            call = parse(message_string)
+        except ActionParseError as e:
+            print("ERROR: " + str(e))
+            return RETRY_MESSAGE.format(e)
+        return self.dispatch(call)
 
+    def dispatch(self, call):
+        # calls the robot function of the API call
+        return self.actions[call.name](*call.args)
 
+class GPTRobot(AsyncGPTRobot):
+    def next_action(self, robot_answer=None):
+        # synchronous API on top of the async one
+        return asyncio.run(self._next_action(robot_answer))
@@ -1,4 +1,10 @@
-from gpt_robot import GPTRobot
+"""
+Manual check of GPTRobot with printing robot functions, answered by a scripted
+StubLLM (no network needed). Make sure to be in `src/`:
+    python -m abstract_robot.gpt_tester
+"""
+from abstract_robot.gpt_robot import GPTRobot
+from abstract_robot.llm import StubLLM
 
 
 
@@ -9,7 +15,9 @@ robot_head = GPTRobot(
     robot_pickup=lambda objectname: print("I am picking up the " + objectname),
     robot_moveto=lambda objectname: print("I am moving to the " + objectname),
     robot_putdown=lambda objectname: print("I am putting down the " + objectname),
+    robot_opendoor=lambda doorname, keyname: print("I am opening the " + doorname + " with the " + keyname),
     finished=lambda: print("I am finished"),
+    llm=StubLLM(["EXPLORE()", "MOVETO(apple)", "PICKUP(apple)", "MOVETO(table)", "PUTDOWN(apple)", "FINISHED"]),
 )
 
 robot_head.next_action()
@@ -0,0 +1,62 @@
+import re
+
+# first sentence of the message replacing old turns
+FOLDED = "{} earlier steps are not shown."
+_folded = re.compile(r"^(\d+) earlier steps are not shown\.")
+
+def count_tokens(messages):
+    # rough token count of messages, 4 characters per token plus a few per message
+    return sum(len(m["content"]) // 4 + 4 for m in messages)
+
+class HistoryManager():
+    """
+    Builds the messages sent to the model from the full conversation. The system
+    prompt and the task (the first `n_fixed` messages) are always sent, followed by
+    the last `keep_last` turns verbatim. Older turns are replaced by one message
+    with the summary returned by `summarize()` (e.g. `World.summary`, no model call).
+    Turns are folded into the summary until the messages fit in `token_budget`,
+    the last turn is always kept.
+    """
+    def __init__(self, keep_last=6, token_budget=2000, summarize=None, n_fixed=2):
+        self.keep_last = keep_last
+        self.token_budget = token_budget
+        self.summarize = summarize
+        self.n_fixed = n_fixed
+
+    def _turns(self, messages):
+        # a turn is an answer of the model followed by the robot's answers
+        turns = []
+        for message in messages:
+            if message["role"] == "assistant" or not turns:
+                turns.append([])
+            turns[-1].append(message)
+        return turns
+
+    def _summary(self, n_folded):
+        summary = FOLDED.format(n_folded)
+        if self.summarize is not None:
+            summary += " Summary of what happened so far: " + self.summarize()
+        return {"role": "user", "content": summary}
+
+    def build(self, messages):
+        fixed, turns = messages[:self.n_fixed], self._turns(messages[self.n_fixed:])
+        if len(turns) <= self.keep_last and count_tokens(messages) <= self.token_budget:
+            return messages
+        kept = turns[-self.keep_last:] if self.keep_last > 0 else turns[-1:]
+        while True:
+            n_folded = len(turns) - len(kept)
+            built = fixed + ([self._summary(n_folded)] if n_folded > 0 else []) + [m for turn in kept for m in turn]
+            if len(kept) <= 1 or count_tokens(built) <= self.token_budget:
+                return built
+            kept = kept[1:]
+
+def count_answers(messages):
+    # answers of the model in the conversation, the ones folded into a summary included
+    n = 0
+    for message in messages:
+        if message["role"] == "assistant":
+            n += 1
+        elif message["role"] == "user":
+            folded = _folded.match(message["content"])
+            if folded: n += int(folded.group(1))
+    return n
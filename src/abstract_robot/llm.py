@@ -0,0 +1,116 @@
+import os
+import asyncio
+from time import sleep
+
+from abstract_robot.history import count_answers
+
+# OpenAI client, imported and given the API key on first use (see `_openai`)
+_client = None
+
+def _openai():
+    # openai and dotenv are slow to import and not needed by offline models
+    global _client
+    if _client is None:
+        import openai
+        from dotenv import load_dotenv
+        load_dotenv()
+        try:
+            openai.api_key = open(os.path.dirname(__file__) + '/openai.key', 'r').readline().rstrip()
+        except:
+            openai.api_key = os.getenv("OPENAI_API_KEY")
+        _client = openai
+    return _client
+
+class LLMResponse():
+    def __init__(self, content, prompt_tokens=0, completion_tokens=0):
+        self.content = content
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+class OpenAIChat():
+    """
+    Chat model behind the OpenAI API. Called with the list of messages, returns an LLMResponse.
+    Models used by `AsyncGPTRobot` can also implement the awaitable `acomplete(messages)`.
+    """
+    def __init__(self, model="gpt-4", max_tokens=256):
+        self.model = model
+        self.max_tokens = max_tokens
+
+    def __call__(self, messages):
+        completion = _openai().ChatCompletion.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=self.max_tokens,
+        )
+        return self._response(completion)
+
+    async def acomplete(self, messages):
+        completion = await _openai().ChatCompletion.acreate(
+            model=self.model,
+            messages=messages,
+            max_tokens=self.max_tokens,
+        )
+        return self._response(completion)
+
+    def _response(self, completion):
+        usage = completion.get("usage", {})
+        return LLMResponse(
+            completion.choices[0].message.content,
+            usage.get("prompt_tokens", 0),
+            usage.get("completion_tokens", 0),
+        )
+
+class StubLLM():
+    """
+    Offline stand-in for the model: answers with the scripted messages in order
+    (the last one is repeated), optionally waiting `latency_s` to mimic the API.
+    The answer is picked from the number of answers already in the conversation,
+    so that it doesn't depend on which calls were answered by a cache.
+    """
+    def __init__(self, answers=("EXPLORE()", "FINISHED"), latency_s=0.0):
+        self.answers = list(answers)
+        self.latency_s = latency_s
+        self.calls = 0
+
+    def __call__(self, messages):
+        if self.latency_s > 0:
+            sleep(self.latency_s)
+        return self._answer(messages)
+
+    async def acomplete(self, messages):
+        if self.latency_s > 0:
+            await asyncio.sleep(self.latency_s)
+        return self._answer(messages)
+
+    def _answer(self, messages):
+        answer = self.answers[min(count_answers(messages), len(self.answers) - 1)]
+        self.calls += 1
+        # rough token count, 4 characters per token
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        return LLMResponse(answer, prompt_tokens, len(answer) // 4)
+
+class BoundedLLM():
+    """
+    Limits how many calls to `llm` are awaited at the same time. Pass the same
+    semaphore to several BoundedLLMs to share the limit between them.
+    """
+    def __init__(self, llm, max_concurrency=16, semaphore=None):
+        self.llm = llm
+        self.max_concurrency = max_concurrency
+        self.semaphore = semaphore
+
+    def __call__(self, messages):
+        return self.llm(messages)
+
+    async def acomplete(self, messages):
+        # created lazily so that it belongs to the running event loop
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self.semaphore:
+            return await acomplete(self.llm, messages)
+
+async def acomplete(llm, messages):
+    # awaits the model, models without `acomplete` are run in a thread
+    if hasattr(llm, "acomplete"):
+        return await llm.acomplete(messages)
+    return await asyncio.to_thread(llm, messages)
@@ -0,0 +1,110 @@
+import json
+import sqlite3
+import hashlib
+from collections import OrderedDict
+
+from abstract_robot.llm import LLMResponse, acomplete
+
+class CacheMiss(KeyError):
+    pass
+
+class ResponseStore():
+    """
+    Answers recorded in a SQLite file, keyed by request hash, with an LRU of the most
+    recent ones in memory. Open one per process and file and share it between the
+    `CachingLLM`s of all episodes, so that they use one connection and one LRU.
+    """
+    def __init__(self, path, memory_size=1024):
+        self.path = path
+        self.memory_size = memory_size
+        self.memory = OrderedDict()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # several processes can record into the same file
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, content TEXT, prompt_tokens INTEGER, completion_tokens INTEGER)")
+        self.db.commit()
+
+    def get(self, key):
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        row = self.db.execute("SELECT content, prompt_tokens, completion_tokens FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        response = LLMResponse(*row)
+        self._remember(key, response)
+        return response
+
+    def put(self, key, response):
+        self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                        (key, response.content, response.prompt_tokens, response.completion_tokens))
+        self.db.commit()
+        self._remember(key, response)
+
+    def _remember(self, key, response):
+        self.memory[key] = response
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def close(self):
+        self.db.close()
+
+class CachingLLM():
+    """
+    Caches the answers of `llm` in a `ResponseStore` (or a SQLite file at that path),
+    keyed by a hash of (model, messages, max_tokens). Modes:
+     * record: answers are read from the cache, the model is only called (and recorded) on misses
+     * replay: answers are only read from the cache, a miss raises CacheMiss (no network needed)
+     * passthrough: the cache is not used
+    """
+    modes = ["record", "replay", "passthrough"]
+
+    def __init__(self, llm, store, mode="record", memory_size=1024):
+        assert mode in self.modes, f"mode has to be one of {self.modes}"
+        self.llm = llm
+        self.mode = mode
+        self.store = ResponseStore(store, memory_size) if isinstance(store, str) else store
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, messages):
+        request = {
+            "model": getattr(self.llm, "model", None),
+            "messages": messages,
+            "max_tokens": getattr(self.llm, "max_tokens", None),
+        }
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+    def _lookup(self, messages):
+        # returns (key, cached response or None)
+        key = self.key(messages)
+        response = self.store.get(key)
+        if response is not None:
+            self.hits += 1
+            return key, response
+        self.misses += 1
+        if self.mode == "replay":
+            raise CacheMiss(f"no recorded answer for request {key}")
+        return key, None
+
+    def __call__(self, messages):
+        if self.mode == "passthrough":
+            return self.llm(messages)
+        key, response = self._lookup(messages)
+        if response is None:
+            response = self.llm(messages)
+            self.store.put(key, response)
+        return response
+
+    async def acomplete(self, messages):
+        if self.mode == "passthrough":
+            return await acomplete(self.llm, messages)
+        key, response = self._lookup(messages)
+        if response is None:
+            response = await acomplete(self.llm, messages)
+            self.store.put(key, response)
+        return response
+
+    def close(self):
+        self.store.close()
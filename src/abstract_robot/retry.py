@@ -0,0 +1,15 @@
+class RetryPolicy():
+    """
+    How many times the model is asked for an answer when its answer can't be
+    processed, and how long to wait before asking again (exponential backoff).
+    """
+    def __init__(self, max_attempts=3, backoff_s=0.0, backoff_factor=2.0, max_backoff_s=10.0):
+        assert max_attempts >= 1, "at least one attempt is needed"
+        self.max_attempts = max_attempts
+        self.backoff_s = backoff_s
+        self.backoff_factor = backoff_factor
+        self.max_backoff_s = max_backoff_s
+
+    def delay(self, attempt):
+        # seconds to wait after the `attempt`-th failed attempt (starting from 1)
+        return min(self.backoff_s * self.backoff_factor ** (attempt - 1), self.max_backoff_s)
@@ -0,0 +1,171 @@
+"""
+Runs many GPTRobot episodes in parallel, each in its own process with a headless world.
+Jobs are read from a JSONL file, one per line:
+    {"config": "../configs/simple_room.yaml", "task": "Open Room2", "seed": 0, "script": ["EXPLORE()", "FINISHED"]}
+Jobs with "plan_mode": true let the model send several API calls per answer.
+`script` is only used with --stub, where the model is replaced by a StubLLM answering
+with the scripted messages (no network needed). Results are written to JSONL as episodes end.
+With --concurrency the episodes run in this process on one event loop instead, with at
+most that many model calls in flight. With --llm-cache the answers of the model are recorded
+to (or replayed from) a SQLite file. With --layout-cache the layout of each config is compiled
+once into that directory and memory-mapped by all workers. With --profile the timings of each
+episode are written as a Chrome trace to that directory and summed up in the results. Make sure to be in `src/`:
+    python batch_runner.py jobs.jsonl results.jsonl --workers 8 --stub
+    python batch_runner.py jobs.jsonl results.jsonl --concurrency 200
+    python batch_runner.py jobs.jsonl results.jsonl --llm-cache answers.db --llm-cache-mode replay
+    python batch_runner.py jobs.jsonl results.jsonl --layout-cache ../.layouts --stub
+    python batch_runner.py jobs.jsonl results.jsonl --profile traces --stub
+"""
+import io
+import os
+import asyncio
+import json
+import time
+import argparse
+import contextlib
+import numpy as np
+from multiprocessing import Pool, util
+from omegaconf import OmegaConf
+
+from gym_env.simple import GridWorldEnv
+from gym_env.utils.layout import load_layout
+from gym_env.utils.profiler import Profiler
+from abstract_robot.gpt_robot import AsyncGPTRobot, GPTRobot
+from abstract_robot.llm import BoundedLLM, OpenAIChat, StubLLM
+from abstract_robot.llm_cache import CachingLLM, ResponseStore
+
+# answer caches opened by this process, by path: one connection and LRU shared by all its episodes
+_response_stores = {}
+
+def _response_store(path):
+    if path not in _response_stores:
+        _response_stores[path] = ResponseStore(path)
+        # closed when the process exits, pool workers included (they skip atexit)
+        util.Finalize(None, _close_response_stores, exitpriority=10)
+    return _response_stores[path]
+
+def _close_response_stores():
+    while _response_stores:
+        _response_stores.popitem()[1].close()
+
+def _make_episode(job, robot_class=GPTRobot):
+    # builds a headless world and a robot for the job
+    cfg = OmegaConf.load(job["config"])
+    size = job.get("size", 100)
+    layout = load_layout(cfg, size, job["layout_cache"]) if job.get("layout_cache") else None
+    np.random.seed(job.get("seed"))
+    env = GridWorldEnv(render_mode=None, size=size, wait_time_s=0, cfg=cfg, fast_forward=True, layout=layout)
+    agent = env.world.agent
+
+    done = {"finished": False}
+    def finished():
+        done["finished"] = True
+        return "finished"
+
+    llm = StubLLM(job.get("script", ["EXPLORE()", "FINISHED"]), job.get("latency_s", 0.0)) if job.get("stub") else OpenAIChat()
+    if job.get("llm_cache"):
+        llm = CachingLLM(llm, _response_store(job["llm_cache"]), job.get("llm_cache_mode", "record"))
+    brain = robot_class(job["task"], agent.explore, agent.pick, agent.goto, agent.drop, agent.open, finished, llm=llm,
+                        plan_mode=job.get("plan_mode", False), validate_plan=env.world.validate_plan)
+    if job.get("profile"):
+        env.world.profiler = brain.profiler = Profiler()
+    return env, brain, done
+
+def run_episode(job):
+    # runs until the robot calls FINISHED
+    env, brain, done = _make_episode(job)
+    error = None
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            last_robot_message = None
+            while not done["finished"] and brain.api_calls < job.get("max_api_calls", 50):
+                last_robot_message = brain.next_action(last_robot_message)
+        except Exception as e:
+            error = repr(e)
+    return _result(job, env, brain, done, error, time.perf_counter() - start)
+
+async def run_episode_async(job, semaphore):
+    # same as `run_episode`, the model calls of all episodes share `semaphore`
+    env, brain, done = _make_episode(job, AsyncGPTRobot)
+    brain.llm = BoundedLLM(brain.llm, semaphore=semaphore)
+    error = None
+    start = time.perf_counter()
+    try:
+        last_robot_message = None
+        while not done["finished"] and brain.api_calls < job.get("max_api_calls", 50):
+            last_robot_message = await brain.next_action(last_robot_message)
+    except Exception as e:
+        error = repr(e)
+    return _result(job, env, brain, done, error, time.perf_counter() - start)
+
+def _result(job, env, brain, done, error, latency_s):
+    result = {
+        "id": job.get("id"),
+        "seed": job.get("seed"),
+        "success": done["finished"] and error is None,
+        **brain.stats(),
+        "steps": int(sum(len(path) - 1 for path in env.world.trajectory)),
+        "latency_s": latency_s,
+        "error": error,
+    }
+    if brain.profiler is not None:
+        os.makedirs(job["profile"], exist_ok=True)
+        brain.profiler.export_chrome_trace(os.path.join(job["profile"], f"episode_{job.get('id')}.json"))
+        result["profile"] = brain.profiler.summary()
+    return result
+
+def run_jobs(jobs, results_path, workers=None):
+    # fans out the jobs over a process pool, results are streamed as they come
+    start = time.perf_counter()
+    with Pool(workers) as pool, open(results_path, "w") as f:
+        for result in pool.imap_unordered(run_episode, jobs):
+            f.write(json.dumps(result) + "\n")
+            f.flush()
+        # let the workers exit (and close their caches) instead of terminating them
+        pool.close()
+        pool.join()
+    return time.perf_counter() - start
+
+async def run_jobs_async(jobs, results_path, concurrency):
+    # interleaves all episodes on the running event loop
+    semaphore = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+    with open(results_path, "w") as f, contextlib.redirect_stdout(io.StringIO()):
+        for episode in asyncio.as_completed([run_episode_async(job, semaphore) for job in jobs]):
+            f.write(json.dumps(await episode) + "\n")
+            f.flush()
+    _close_response_stores()
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run GPTRobot episodes in parallel")
+    parser.add_argument("jobs", help="JSONL file with one job per line")
+    parser.add_argument("results", help="JSONL file the results are written to")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: number of cores)")
+    parser.add_argument("--concurrency", type=int, default=None, help="run on one event loop with at most this many model calls in flight")
+    parser.add_argument("--llm-cache", default=None, help="SQLite file the answers of the model are cached in")
+    parser.add_argument("--llm-cache-mode", default="record", choices=CachingLLM.modes, help="how the cache is used")
+    parser.add_argument("--layout-cache", default=None, help="directory the compiled layouts of the configs are cached in")
+    parser.add_argument("--profile", default=None, help="directory the Chrome traces of the episodes are written to")
+    parser.add_argument("--stub", action="store_true", help="use a scripted StubLLM instead of the OpenAI API")
+    args = parser.parse_args()
+
+    with open(args.jobs) as f:
+        jobs = [json.loads(line) for line in f if line.strip()]
+    for i, job in enumerate(jobs):
+        job.setdefault("id", i)
+        job["stub"] = job.get("stub", False) or args.stub
+        if args.llm_cache is not None:
+            job.setdefault("llm_cache", args.llm_cache)
+            job.setdefault("llm_cache_mode", args.llm_cache_mode)
+        if args.layout_cache is not None:
+            job.setdefault("layout_cache", args.layout_cache)
+        if args.profile is not None:
+            job.setdefault("profile", args.profile)
+
+    if args.concurrency is None:
+        elapsed = run_jobs(jobs, args.results, args.workers)
+    else:
+        elapsed = asyncio.run(run_jobs_async(jobs, args.results, args.concurrency))
+    print(f"{len(jobs)} episodes in {elapsed:.2f}s ({len(jobs)/elapsed:.1f} episodes/s)")
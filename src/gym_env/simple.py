@@ -1,5 +1,4 @@
 import os
-import pygame
 import threading
 import numpy as np
 import gymnasium as gym
@@ -14,10 +13,10 @@ os.environ['SDL_VIDEO_WINDOW_POS'] = str(0) + "," + str(0)
 class GridWorldEnv(gym.Env):
     metadata = {"render_modes": ["human", "rgb_array"], "render_fps": 4}
 
-    def __init__(self, render_mode=None, size=10, wait_time_s=0.2, cfg=None):
+    def __init__(self, render_mode=None, size=10, wait_time_s=0.2, cfg=None, fast_forward=False, obs_size=None, layout=None):
         
-        # create world
-        self.world = World(size=size, wait_time_s=wait_time_s, cfg=cfg)
+        # create world (in fast forward mode the agent doesn't wait between grid steps, a compiled layout skips laying out the config)
+        self.world = World(size=size, wait_time_s=wait_time_s, cfg=cfg, fast_forward=fast_forward, layout=layout)
 
         assert render_mode is None or render_mode in self.metadata["render_modes"]
         self.render_mode = render_mode
@@ -32,6 +31,14 @@ class GridWorldEnv(gym.Env):
         self.window = None
         self.clock = None
         self.window_size = 512  # The size of the PyGame window
+        """
+        In rgb_array mode frames are written into `self._frame`, a buffer reused
+        across calls. If `obs_size` is set, frames are downscaled to
+        (obs_size, obs_size) through `self._obs_surface`.
+        """
+        self.obs_size = obs_size
+        self._frame = None
+        self._obs_surface = None
         self.wait_time_s = wait_time_s
         self.open_thread = False
 
@@ -85,11 +92,24 @@ class GridWorldEnv(gym.Env):
         # Start the background thread
         self.thread.start()
 
+    def replay(self, trajectory=None, wait_time_s=None):
+        # walks the agent again along recorded paths (by default the ones recorded by the world)
+        trajectory = self.world.trajectory if trajectory is None else trajectory
+        wait_time_s = self.wait_time_s if wait_time_s is None else wait_time_s
+        for path in list(trajectory):
+            for xy in path:
+                self.world.agent.state.p_pos = np.array(xy)
+                self.world.publish()
+                if self.render_mode == "human":
+                    self._render_frame()
+                sleep(wait_time_s)
+
     def render(self):
         if self.render_mode == "rgb_array":
             return self._render_frame()
 
     def _render_frame(self):
+        import pygame
         if self.window is None and self.render_mode == "human":
             pygame.init()
             pygame.display.init()
@@ -99,22 +119,48 @@ class GridWorldEnv(gym.Env):
         if self.clock is None and self.render_mode == "human":
             self.clock = pygame.time.Clock()
 
-        # create and draw on canvas
+        # draw on canvas the parts of the world that changed
         canvas = self.world._render_frame()
 
         if self.render_mode == "human":
-            # The following line copies our drawings from `canvas` to the visible window
-            self.window.blit(canvas, canvas.get_rect())
+            # The following lines copy the changed regions of `canvas` to the visible window
+            rects = self.world.renderer.dirty_rects
+            for rect in rects:
+                self.window.blit(canvas, rect, rect)
             pygame.event.pump()
-            pygame.display.update()
+            if rects:
+                pygame.display.update(rects)
 
             # We need to ensure that human-rendering occurs at the predefined framerate.
             # The following line will automatically add a delay to keep the framerate stable.
             self.clock.tick(self.metadata["render_fps"])
         else:  # rgb_array
-            return np.transpose(
-                np.array(pygame.surfarray.pixels3d(canvas)), axes=(1, 0, 2)
-            )
+            return self._frame_to_array(canvas)
+
+    def _frame_to_array(self, canvas):
+        # copies the canvas into the reused frame buffer (copy the returned array to keep it)
+        import pygame
+        full = self._frame is None
+        if full:
+            frame_size = self.obs_size or self.world.window_size
+            self._frame = np.zeros((frame_size, frame_size, 3), dtype=np.uint8)
+        rects = self.world.renderer.dirty_rects
+        if self.obs_size is not None:
+            # downscale the whole canvas only if something changed
+            if full or rects:
+                if self._obs_surface is None:
+                    self._obs_surface = pygame.Surface((self.obs_size, self.obs_size))
+                pygame.transform.smoothscale(canvas, (self.obs_size, self.obs_size), self._obs_surface)
+                # the buffer is (height, width, 3) while surfaces are indexed (x, y)
+                pygame.pixelcopy.surface_to_array(self._frame.transpose(1, 0, 2), self._obs_surface)
+            return self._frame
+        # copy only the regions of the canvas that changed
+        for rect in [canvas.get_rect()] if full else rects:
+            rect = rect.clip(canvas.get_rect())
+            if rect.width == 0 or rect.height == 0: continue
+            view = self._frame[rect.top:rect.bottom, rect.left:rect.right]
+            pygame.pixelcopy.surface_to_array(view.transpose(1, 0, 2), canvas.subsurface(rect))
+        return self._frame
 
     def close(self):
         # close thread
@@ -122,5 +168,6 @@ class GridWorldEnv(gym.Env):
         self.thread.join()
         # close window
         if self.window is not None:
+            import pygame
             pygame.display.quit()
             pygame.quit()
\ No newline at end of file
@@ -1,52 +1,108 @@
-import pygame
 import numpy as np
-import networkx as nx
-import seaborn as sns
-import colorcet as cc
-from time import sleep
+from time import perf_counter, sleep
 from itertools import product
 
-from typing import Optional, Tuple, Union
-
-color_palette = sns.color_palette(cc.glasbey, n_colors=3).as_hex() # TODO
-
-class EntityState:  # physical/external base state of all entities
-  def __init__(self):
-    # physical position
-    self.p_pos: Optional[np.ndarray] = None
+from typing import TYPE_CHECKING, Optional, Tuple, Union
+
+from gym_env.utils.navigation import DIRECTIONS, PathCache
+from gym_env.utils.registry import EntityRegistry
+from gym_env.utils.store import EntityStore
+from gym_env.utils.layout import KEY, compile_layout
+
+# first colors of colorcet's glasbey palette (precomputed, seaborn and colorcet are slow to import)
+color_palette = ['#d60000', '#8c3bff', '#018700'] # TODO
+
+# DIRECTIONS as (dx, dy) ints, `World.step` updates the position with Python scalars
+DIRECTION_STEPS = [tuple(int(v) for v in d) for d in DIRECTIONS]
+
+if TYPE_CHECKING:
+  # pygame is only imported when drawing
+  import pygame
+
+class Failure(str):
+  # answer of a GPT function that could not be carried out
+  failed = True
+
+def _rgb(color) -> Tuple[int, int, int]:
+  # (r, g, b) of a color given as hex string or tuple
+  if isinstance(color, str):
+    return tuple(int(color[j:j+2], 16) for j in (1, 3, 5))
+  return tuple(int(c) for c in color[:3])
+
+class ExploreResult(str):
+  """
+  Answer of `Agent.explore`: the text sent to GPT, rendered once when the result is
+  built, with the names it lists (in order of registration) as attributes.
+  """
+  def __new__(cls, keys, objects, closed_doors, held):
+    listing = lambda prefix, names: prefix + (": " + ", ".join(names) if names else "") + ". "
+    text = listing("I found the following keys in the open rooms", keys)
+    if objects: text += listing("The following objects were found", objects)
+    text += listing("The following doors are closed", closed_doors)
+    result = super().__new__(cls, text)
+    result.keys, result.objects, result.closed_doors, result.held = tuple(keys), tuple(objects), tuple(closed_doors), tuple(held)
+    return result
+
+class EntityState:  # physical/external base state of all entities, a row of an EntityStore
+  __slots__ = ("store", "row")
+
+  def __init__(self, store: Optional[EntityStore] = None):
+    # entities created outside of a world get a store of their own
+    self.store = EntityStore(1) if store is None else store
+    self.row = self.store.add()
+
+  @property
+  def p_pos(self) -> np.ndarray:
+    # physical position (view on the store, assigning to it copies the values)
+    return self.store.pos[self.row]
+
+  @p_pos.setter
+  def p_pos(self, value):
+    self.store.pos[self.row] = value
 
 class Action:  # action of the agent
-  def __init__(self):
-    """
-    The following dictionary maps abstract actions from `self.action_space` to
-    the direction we will walk in if that action is taken.
-    I.e. 0 corresponds to "right", 1 to "up" etc.
-    """
-    self._action_to_direction = {
-        0: np.array([1, 0]),
-        1: np.array([0, 1]),
-        2: np.array([-1, 0]),
-        3: np.array([0, -1]),
-    }
+  """
+  `_action_to_direction` maps abstract actions from `self.action_space` to
+  the direction we will walk in if that action is taken.
+  I.e. 0 corresponds to "right", 1 to "up" etc. The table is shared by all agents.
+  """
+  __slots__ = ("u",)
+  _action_to_direction = DIRECTIONS
 
+  def __init__(self):
     # physical action
     self.u: Optional[np.ndarray] = None
 
 
 class Entity:  # properties and state of physical world entity
-  def __init__(self):
+  __slots__ = ("name", "i", "state")
+  # size when drawing
+  size = 50 # TODO
+
+  def __init__(self, store: Optional[EntityStore] = None):
     # name
     self.name: str = ""
     # id
     self.i: Optional[int] = None
-    # color TODO: randomize color
-    self.color: Optional[Tuple[float]] = None
     # state
-    self.state = EntityState()
-    # size when drawing
-    self.size = 50 # TODO 
+    self.state = EntityState(store)
+
+  @property
+  def draw_entity(self) -> bool:
     # whether to draw entity
-    self.draw_entity = True
+    return bool(self.state.store.visible[self.state.row])
+
+  @draw_entity.setter
+  def draw_entity(self, value: bool):
+    self.state.store.visible[self.state.row] = value
+
+  @property
+  def color(self) -> Tuple[int, int, int]:
+    return tuple(int(c) for c in self.state.store.color[self.state.row])
+
+  @color.setter
+  def color(self, value):
+    self.state.store.color[self.state.row] = _rgb(value)
 
   def draw(self):
     # Draws the entity on the canvas
@@ -54,9 +110,13 @@ class Entity:  # properties and state of physical world entity
 
 
 class Room(Entity):
-  def __init__(self, name:str, dimensions):
+  __slots__ = ("dimensions", "sizex", "sizey", "vtl", "vbl", "vbr", "vtr", "door")
+
+  def __init__(self, name:str, dimensions, i:int=0, store: Optional[EntityStore] = None):
     # name
     self.name = name
+    # id (also the bit of the room's door in the world's door state)
+    self.i = i
     # room size (indicates how much to go down and left from top right point of main room)
     # self.size = size
     # room vertices
@@ -65,30 +125,35 @@ class Room(Entity):
     self.sizey = yb-ya
     self.sizex = xb-xa
     self.vtl, self.vbl, self.vbr, self.vtr = (np.array([xa, ya]), np.array([xa, yb]), np.array([xb, yb]), np.array([xb, ya]))
-    # door, TODO: change door name
+    # door in the middle of the bottom wall (integer cell so that it lies on the navigation grid), TODO: change door name
+    door_loc = np.array([(xa + xb) // 2, yb])
     if name.startswith("main"):
-      self.door = Door(name="main_door", loc=np.mean((self.vbl, self.vbr), 0), room=self, is_open=True)
+      self.door = Door(name="main_door", loc=door_loc, room=self, is_open=True, store=store)
     else:
-      self.door = Door(name= "Door_"+self.name, loc=np.mean((self.vbl, self.vbr), 0), room=self, is_open=False) # main room has no door (u cannot escape)
+      self.door = Door(name= "Door_"+self.name, loc=door_loc, room=self, is_open=False, store=store) # main room has no door (u cannot escape)
 
-    # navigation graph
-    self.graph = nx.grid_graph(dim=(range(xa, xb), range(ya, yb)))
+  def draw(self, canvas: "pygame.Surface", pix_square_size: float):
+    self.draw_walls(canvas, pix_square_size)
+    # draw door
+    self.door.draw(canvas, pix_square_size)
 
-  def draw(self, canvas: pygame.Surface, pix_square_size: float):
+  def draw_walls(self, canvas: "pygame.Surface", pix_square_size: float):
+    import pygame
     # draw delimiting edges of canvas
     pygame.draw.line(canvas, 0, self.vtl*pix_square_size, self.vbl*pix_square_size, width=3)
     pygame.draw.line(canvas, 0, self.vbl*pix_square_size, self.vbr*pix_square_size, width=3)
     pygame.draw.line(canvas, 0, self.vbr*pix_square_size, self.vtr*pix_square_size, width=3)
     pygame.draw.line(canvas, 0, self.vtr*pix_square_size, self.vtl*pix_square_size, width=3)
-    # draw door
-    self.door.draw(canvas, pix_square_size)
 
 class Door(Entity):
-  def __init__(self, name: str, loc: np.ndarray, room: Room, is_open: bool):
-    super().__init__()
+  __slots__ = ("room", "key")
+
+  def __init__(self, name: str, loc: np.ndarray, room: Room, is_open: bool, store: Optional[EntityStore] = None):
+    super().__init__(store)
     self.name = name
     # location
     self.state.p_pos = loc
+    self.state.store.room[self.state.row] = room.i
     # door always starts off closed
     self.open = is_open
     # room
@@ -96,8 +161,16 @@ class Door(Entity):
     # key that opens this door
     self.key: Key = None
 
+  @property
+  def open(self) -> bool:
+    return bool(self.state.store.open[self.state.row])
+
+  @open.setter
+  def open(self, value: bool):
+    self.state.store.open[self.state.row] = value
 
-  def draw(self, canvas: pygame.Surface, pix_square_size: float):
+  def draw(self, canvas: "pygame.Surface", pix_square_size: float):
+    import pygame
     # if door is open color it white
     color = (255, 255, 255) if self.open else (0, 0, 0)
     # Draw key as a rectangle
@@ -112,22 +185,34 @@ class Door(Entity):
 
 
 class Key(Entity):
-  def __init__(self, name, i, loc: np.ndarray, inroom: Room, forroom: Room):
-    super().__init__()
+  __slots__ = ("_inroom", "forroom")
+
+  def __init__(self, name, i, loc: np.ndarray, inroom: Room, forroom: Room, store: Optional[EntityStore] = None):
+    super().__init__(store)
     # name
     self.name = name
     # id
     self.i = i
     # state
-    self.state = EntityState()
     self.state.p_pos = loc
     # color
-    self.color = color_palette[self.i] # red 
+    self.color = color_palette[self.i % len(color_palette)] # red 
     # room
     self.inroom: Room = inroom
     self.forroom: Room = forroom
 
-  def draw(self, canvas: pygame.Surface, pix_square_size: float):
+  @property
+  def inroom(self) -> Room:
+    return self._inroom
+
+  @inroom.setter
+  def inroom(self, room: Room):
+    # the id of the room is kept in the store as well
+    self._inroom = room
+    self.state.store.room[self.state.row] = room.i
+
+  def draw(self, canvas: "pygame.Surface", pix_square_size: float):
+    import pygame
     # check whether to draw entity from parent class
     if not self.draw_entity: return
     # Draw key as a rectangle
@@ -141,21 +226,33 @@ class Key(Entity):
     )
      
 class GeneralObject(Entity):
-  def __init__(self, name, i, loc: np.ndarray, room: Room):
-    super().__init__()
+  __slots__ = ("_room",)
+
+  def __init__(self, name, i, loc: np.ndarray, room: Room, store: Optional[EntityStore] = None):
+    super().__init__(store)
     # name
     self.name = name
     # id
     self.i = i
     # state
-    self.state = EntityState()
     self.state.p_pos = loc
     # color
-    self.color = color_palette[self.i] # red 
+    self.color = color_palette[self.i % len(color_palette)] # red 
     # room
     self.room: Room = room
 
-  def draw(self, canvas: pygame.Surface, pix_square_size: float):
+  @property
+  def room(self) -> Room:
+    return self._room
+
+  @room.setter
+  def room(self, room: Room):
+    # the id of the room is kept in the store as well
+    self._room = room
+    self.state.store.room[self.state.row] = room.i
+
+  def draw(self, canvas: "pygame.Surface", pix_square_size: float):
+    import pygame
     # check whether to draw entity from parent class
     if not self.draw_entity: return
     # Draw object as a rectangle
@@ -170,13 +267,13 @@ class GeneralObject(Entity):
 
 
 class Agent(Entity):  # properties of agent entities
+  __slots__ = ("world", "action", "action_callback")
+
   def __init__(self, name, world):
-    super().__init__()
+    super().__init__(world.store)
     self.name = name
     # the world the agent is in
     self.world: World = world
-    # state
-    self.state = EntityState()
     # color
     self.color = (0, 0, 255) # blue
     # action
@@ -184,7 +281,8 @@ class Agent(Entity):  # properties of agent entities
     # script behavior to execute
     self.action_callback = None
 
-  def draw(self, canvas: pygame.Surface, pix_square_size: float):
+  def draw(self, canvas: "pygame.Surface", pix_square_size: float):
+    import pygame
     # check whether to draw entity from parent class
     if not self.draw_entity: return
     # draw agent as a circle
@@ -198,9 +296,9 @@ class Agent(Entity):  # properties of agent entities
   def _get_entity(self, entity: Union[int, str, Entity]):
     # gets correct entity given multi-type input
     if isinstance(entity, int):
-      entity = list(self.world.keys.values())[entity]
+      entity = self.world.entities.by_id[entity]
     elif isinstance(entity, str):
-      entity = self.world.keys[entity]
+      entity = self.world.entities[entity]
     elif isinstance(entity, Entity) and not isinstance(entity, Room):
       pass
     else:
@@ -211,37 +309,14 @@ class Agent(Entity):  # properties of agent entities
   def act(self, action):
     # applies action to move robot
     self.world.step(action)
+    self.world.publish()
 
   def explore(self):
     """
     GPT function: returns id and name of keys in same room as agent
     """
-    # returns the objects found in the room
-    # returns a key if in main room or if it's in an open room 
-    # otherwise it returns the door of the closed room
-    s = f"I found the following keys in the open rooms: "
-    for key in self.world.keys.values():
-      if key.inroom.door.open:
-        s += f"{key.name}, "
-    s = s[:-2] + ". "
-    if len([obj for obj in self.world.objects.values() if obj.room.door.open]) > 0:  
-      s += f"The following objects were found: "
-      for obj in self.world.objects.values():
-        if obj.room.door.open:
-          s += f"{obj.name}, "
-      s = s[:-2] + ". "
-    s += f"The following doors are closed: "
-    for room in self.world.rooms.values():
-      if not room.door.open:
-        s += f"{room.door.name}, "
-    s = s[:-2] + ". "
-    return s
-
-
-    objectlist = list(self.world.keys.values()) + list(self.world.objects.values())
-  
-    s += ", ".join([k.name if k.room.door.open else k.room.door.name for k in objectlist])
-    return s
+    # returns the keys and objects in the open rooms and the doors of the closed ones
+    return self.world.explore()
 
   def goto(self, entity_name: str):
     """
@@ -254,29 +329,38 @@ class Agent(Entity):  # properties of agent entities
 
     # check if it was a key and it was picked already
     if isinstance(entity, Key) and not entity.draw_entity:
-      return f"{entity_name} was picked already."
-
-    try:
-      # compute path from source to target (tuples as input for dijkstra)
-      path = nx.dijkstra_path(self.world.graph,
-        tuple(self.state.p_pos), 
-        tuple(entity.state.p_pos)
-      )[1:] # remove source
-    except:
+      return Failure(f"{entity_name} was picked already.")
+
+    # compute path from source to target (source excluded)
+    profiler = self.world.profiler
+    if profiler is not None: start = perf_counter()
+    path = self.world.shortest_path(tuple(self.state.p_pos), tuple(entity.state.p_pos))
+    if profiler is not None: profiler.record("plan_path", start, target=entity.name, path_len=len(path) if path is not None else -1)
+    if path is None:
       try:
-        return f"{entity.name} is not accesible because you didn't open {entity.room.door.name} yet"
+        return Failure(f"{entity.name} is not accesible because you didn't open {entity.room.door.name} yet")
       except:
-        return f"{entity.name} is not accesible because you didn't open {entity.inroom.door.name} yet"
+        return Failure(f"{entity.name} is not accesible because you didn't open {entity.inroom.door.name} yet")
     
-    # convert waypoints to np.array
-    path = [np.array(xy) for xy in path]
-
-    # compute needed action from current pos to next waypoint
-    for xy in path:
-      action = xy - self.state.p_pos
+    # record trajectory (starting position included) for replay
+    trajectory = np.array([tuple(self.state.p_pos)] + path, dtype=int).reshape(-1, 2)
+    self.world.trajectory.append(trajectory)
+    # steps from current pos to each next waypoint
+    deltas = np.diff(trajectory, axis=0)
+
+    if self.world.fast_forward:
+      # apply the whole path at once, nobody is watching the single steps
+      self.world.step_path(deltas)
+      if profiler is not None: profiler.record("goto", start, target=entity.name, steps=len(deltas), sleep_s=0.0)
+      return f"You have moved correctly to the same location as {entity.name}."
+
+    for action in deltas:
       self.world.step(action)
+      # one snapshot per paced step, which is what the renderer can show
+      self.world.publish()
       sleep(self.world.wait_time_s) # sleep as in rendering
 
+    if profiler is not None: profiler.record("goto", start, target=entity.name, steps=len(deltas), sleep_s=len(deltas)*self.world.wait_time_s)
     return f"You have moved correctly to the same location as {entity.name}."
 
   def pick(self, obj_name: str):
@@ -286,38 +370,45 @@ class Agent(Entity):  # properties of agent entities
     # for the moment it simply doesn't draw the entity that is picked up
     #entity = self._get_entity(entity)
 
-    if obj_name in self.world.keys.keys():
-      obj = self.world.keys[obj_name]
-    else:
-      obj = self.world.objects[obj_name]
+    obj = self.world.get_item(obj_name)
 
     # check if key was already picked
     if not obj.draw_entity:
-      return f"{obj_name} is already picked."
+      return Failure(f"{obj_name} is already picked.")
 
     # check that agent is at entity's location
     if not np.array_equal(self.state.p_pos, obj.state.p_pos):
-      return f"Cannot pick {obj_name} because you are not at the same location."
+      return Failure(f"Cannot pick {obj_name} because you are not at the same location.")
 
     obj.draw_entity = False
+    # the object is not on the grid while it's held
+    self.world.entities.move(obj, room=self.world.entities.room_of(obj), cell=None)
+    self.world.item_moved(obj)
+    self.world.publish()
     return f"{obj_name} was picked up"
 
   def drop(self, obj_name: str):
     """
     GPT function: Agent drops entity at its location. It simply starts drawing again the entity
     """
-    if obj_name in self.world.keys.keys():
-      obj = self.world.keys[obj_name]
-    else:
-      obj = self.world.objects[obj_name]
+    obj = self.world.get_item(obj_name)
 
     # check that entity was actually picked
     if obj.draw_entity:
-      return f"entity {obj.name} was not picked. You need pick it first before dropping it."
+      return Failure(f"entity {obj.name} was not picked. You need pick it first before dropping it.")
 
+    # paths to where the entity was picked are unlikely to be planned again
+    self.world.path_cache.invalidate(cell=tuple(obj.state.p_pos))
     # update entity's position and draw it since it's dropped
     obj.state.p_pos = self.state.p_pos
     obj.draw_entity = True
+    # the object is now in the room the agent is in
+    room = self.world.room_at(self.state.p_pos)
+    if isinstance(obj, Key): obj.inroom = room
+    else: obj.room = room
+    self.world.entities.move(obj, room=room.name, cell=tuple(self.state.p_pos))
+    self.world.item_moved(obj)
+    self.world.publish()
     return f"entity {obj.name} was dropped."
 
   def open(self, door_name:str, key_name:str):
@@ -328,22 +419,28 @@ class Agent(Entity):  # properties of agent entities
     key = self.world.keys[key_name]
     # check that key was actually picked
     if key.draw_entity:
-      return f"{key.name} cannot be used to open {door_name} because it was not picked"
+      return Failure(f"{key.name} cannot be used to open {door_name} because it was not picked")
 
     # check that the key is the one that opens the dorr
     if door.key.name != key_name:
-      return f"{key_name} cannot be used to open {door_name}. You have to open {door_name} with {door.key.name}."
+      return Failure(f"{key_name} cannot be used to open {door_name}. You have to open {door_name} with {door.key.name}.")
     
+    profiler = self.world.profiler
+    if profiler is not None: start = perf_counter()
     # goto room
     self.goto(door_name)
     # open door
     door.open = True
-    # add new room to navigation graph
-    #room_graph = nx.grid_graph(dim=(door.room.sizex, door.room.sizey))
-    room_graph = door.room.graph
-    self.world.graph = nx.compose(self.world.graph, room_graph)
-    self.world.graph.add_edge(tuple(door.state.p_pos), tuple(door.state.p_pos-np.array([0, 1])))
-
+    self.world.door_state |= 1 << door.room.i
+    # add new room to navigation grid (the door edge was registered when creating the grid)
+    self.world.nav.open_room(door.room.dimensions)
+    # targets in the room were cached as unreachable
+    self.world.path_cache.invalidate(unreachable=True)
+    # keys and objects in the room can be found now
+    self.world.show_room(door.room)
+    self.world.publish()
+
+    if profiler is not None: profiler.record("open", start, door=door_name)
     return f"{door_name} has been opened correctly"
 
 class World:
@@ -352,7 +449,7 @@ class World:
     # returns a random position within the dimensions
     return np.array([np.random.randint(dimensions[0], dimensions[2]), np.random.randint(dimensions[1], dimensions[3])])
 
-  def __init__(self, size, wait_time_s, cfg) -> None:
+  def __init__(self, size, wait_time_s, cfg=None, fast_forward=False, layout=None) -> None:
 
     # world dimensions
     self.size = size
@@ -367,150 +464,288 @@ class World:
         )  # The size of a single grid square in pixels
     # wait time when updating state
     self.wait_time_s = wait_time_s
+    # if True paths are applied at once without waiting (headless runs)
+    self.fast_forward = fast_forward
+    # paths walked by the agent, one (T+1, 2) array per `goto`
+    self.trajectory = []
+    # Profiler recording timings of the world and agent (nothing is recorded if None)
+    self.profiler = None
+    # position, visibility, color and room of all entities
+    self.store = EntityStore()
 
     # init agent
     self.agent: Agent = Agent(name="agent", world=self)
 
-    # create rooms
-    self.rooms = {(name:="main_room") : Room(name, dimensions=(0,self.size//2,self.size,self.size))} # room that contains all other rooms
+    # static layout of rooms, doors and items (compiled from the config if not given)
+    self.layout = compile_layout(cfg, size) if layout is None else layout
+    assert self.layout.size == size, f"layout was compiled for size {self.layout.size}"
+
+    # create rooms (main_room contains all other rooms)
+    self.rooms = {}
+    for name, dimensions in zip(self.layout.room_names, self.layout.room_dims.tolist()):
+      self.rooms.update({name : Room(name, dimensions=tuple(dimensions), i=len(self.rooms), store=self.store)})
+    rooms = list(self.rooms.values())
+    # keys and objects in the order they were placed, with the room they start in
     self.keys = {}
     self.objects = {}
+    self._spawn = []
     id_counter = 0
-    n_rooms = len(cfg.rooms)
-    room_size = self.size // n_rooms
-    for i,room in enumerate(cfg.rooms):
-      if room.name == "main_room": continue
-      dimensions = (room_size*(i-1), 0, room_size*i, self.size//2)
-      roomname = room.name
-      self.rooms.update({roomname : Room(roomname, dimensions=dimensions)})
-    for room in cfg.rooms:
-      roomname = room.name
-      dimensions = self.rooms[roomname].dimensions
-      for key in room.doorkeys:
-        self.keys.update({key.name : Key(name=key.name, i=id_counter, loc=self.random_pos(dimensions), inroom=self.rooms[roomname], forroom=self.rooms[key.forroom])})
-        self.rooms[key.forroom].door.key = self.keys[key.name]
+    for name, kind, room_id, forroom_id in zip(self.layout.item_names, self.layout.item_kind.tolist(), self.layout.item_room.tolist(), self.layout.item_forroom.tolist()):
+      room = rooms[room_id]
+      if kind == KEY:
+        self.keys.update({name : Key(name=name, i=id_counter, loc=self.random_pos(room.dimensions), inroom=room, forroom=rooms[forroom_id], store=self.store)})
+        rooms[forroom_id].door.key = self.keys[name]
         id_counter += 1
-      for obj in room.objects:
-        self.objects.update({obj.name : GeneralObject(name=obj.name, i=id_counter, loc=self.random_pos(dimensions), room=self.rooms[roomname])})
-
-
-    # self.rooms.update({(name:=f"room_{i}") : Room(name, size=size//3) for i in range(1)})
-
-    # init keys
-
-    # self.keys = {(name:=f"key_{i}") : Key(name=name, i=i, loc=) for i in range(3)}
+        self._spawn.append((self.keys[name], room))
+      else:
+        self.objects.update({name : GeneralObject(name=name, i=id_counter, loc=self.random_pos(room.dimensions), room=room, store=self.store)})
+        self._spawn.append((self.objects[name], room))
 
-    # store all entities
-    self.entities = self.rooms | self.keys | self.objects
+    # store all entities, keys first so that their ids match their order
+    self.entities = EntityRegistry()
+    for key in self.keys.values():
+      self.entities.add(key, room=key.inroom.name, cell=tuple(key.state.p_pos))
+    for obj in self.objects.values():
+      self.entities.add(obj, room=obj.room.name, cell=tuple(obj.state.p_pos))
+    for room in self.rooms.values():
+      self.entities.add(room)
     # add doors to entity
-    self.entities.update({r.door.name: r.door for r in self.rooms.values() if not r.door.name.startswith("main")})
-
-    # create navigation graph
-    self.graph = self._init_graph()
+    for room in self.rooms.values():
+      if not room.door.name.startswith("main"):
+        self.entities.add(room.door, room=room.name, cell=tuple(room.door.state.p_pos))
+    # rooms by id, the id of the region they cover in the navigation grid
+    self._rooms_by_id = {room.i: room for room in self.rooms.values()}
+
+    # keys and objects that explore finds
+    self._init_visibility()
+
+    # navigation grid (all doors but the main one are closed at first)
+    self.nav = self.layout.nav()
+    # state restored by `reset`
+    self._initial_walkable, self._initial_moves = self.layout.walkable, self.layout.moves
+    self._initial_open = self.store.open.copy()
+    # bitmask of open doors (bit i for room with id i) and paths planned so far
+    self.door_state = self._init_door_state()
+    self.path_cache = PathCache()
+
+    # draws the world on a canvas, redrawing only what changes (created when first used)
+    self._renderer = None
 
     # set random location of agent always in main_room
     self.agent.state.p_pos = np.random.randint(self.size//2, self.size-1, (2,))
-
-  def _init_graph(self):
-    # create navigation graph
-    graph = nx.grid_graph(dim=(self.size, self.size))
-    # remove nodes of closed rooms
+    # the renderer draws the last published snapshot of the entities (redrawn whole after each reset)
+    self.version = 0
+    self.epoch = 0
+    self.publish()
+    # rows of the store returned as observation
+    self._obs_names = [entity.name for entity in [self.agent]+list(self.keys.values())]
+    self._obs_rows = np.array([entity.state.row for entity in [self.agent]+list(self.keys.values())])
+
+  def _init_door_state(self):
+    door_state = 0
     for room in self.rooms.values():
-      if room.name.startswith("main"): continue
-      #room_nodes = product(list(range(room.sizex)), list(range(room.sizey)))
-      room_nodes = room.graph.nodes
-      for node in room_nodes:
-        graph.remove_node(node)
-    return graph
+      if room.door.open: door_state |= 1 << room.i
+    return door_state
+
+  def _init_visibility(self):
+    # names of the items in open rooms and of the held ones, mapped to their id for ordering
+    self._visible = {}
+    self._held = {}
+    self._explore_result = None
+    for room in self.rooms.values():
+      if room.door.open: self.show_room(room)
+    for item in list(self.keys.values()) + list(self.objects.values()):
+      self.item_moved(item)
+
+  def show_room(self, room):
+    # adds the keys and objects of a room that was opened
+    for entity in self.entities.in_room(room.name):
+      if isinstance(entity, (Key, GeneralObject)):
+        self._visible[entity.name] = self.entities.id(entity)
+    self._explore_result = None
+
+  def item_moved(self, item):
+    # updates the visibility of a key or object that was picked or dropped
+    room = item.inroom if isinstance(item, Key) else item.room
+    if room.door.open: self._visible[item.name] = self.entities.id(item)
+    else: self._visible.pop(item.name, None)
+    if item.draw_entity: self._held.pop(item.name, None)
+    else: self._held[item.name] = self.entities.id(item)
+    self._explore_result = None
+
+  def explore(self) -> ExploreResult:
+    # what the agent finds when exploring, only rebuilt after open, pick or drop
+    if self._explore_result is None:
+      visible = sorted(self._visible, key=self._visible.get)
+      self._explore_result = ExploreResult(
+        keys=[name for name in visible if name in self.keys],
+        objects=[name for name in visible if name in self.objects],
+        closed_doors=[room.door.name for room in self.rooms.values() if not room.door.open],
+        held=sorted(self._held, key=self._held.get),
+      )
+    return self._explore_result
+
+  def get_item(self, name):
+    # key or object that can be picked, raises KeyError otherwise
+    entity = self.entities[name]
+    if not isinstance(entity, (Key, GeneralObject)):
+      raise KeyError(f"{name} is not an object or a key")
+    return entity
+
+  def room_at(self, cell):
+    # room containing grid cell (x, y)
+    return self._rooms_by_id[int(self.nav.region[int(cell[0]), int(cell[1])])]
+
+  def at(self, cell):
+    # entities on grid cell (x, y)
+    return self.entities.at(cell)
+
+  def shortest_path(self, source, target):
+    # plans a path on the navigation grid reusing the paths planned before
+    source, target = (int(source[0]), int(source[1])), (int(target[0]), int(target[1]))
+    if source == target: return []
+    try:
+      return self.path_cache.get(source, target, self.door_state)
+    except KeyError:
+      path = self.nav.shortest_path(source, target)
+      self.path_cache.put(source, target, self.door_state, path)
+      return path
 
   def step(self, action: Union[int, np.ndarray]):
-    if isinstance(action, int):
+    # moves the agent without publishing (nor allocating arrays), call `publish` to show the change
+    if isinstance(action, (int, np.integer)):
       # Map the action (element of {0,1,2,3}) to the direction we walk in
-      direction = self.agent.action._action_to_direction[action]
+      dx, dy = DIRECTION_STEPS[action]
     else:
       assert isinstance(action, np.ndarray), "action neither Int nor np.array"
-      direction = action
-    # We use `np.clip` to make sure we don't leave the grid
-    self.agent.state.p_pos = np.clip(
-        self.agent.state.p_pos + direction, 0, self.size - 1
-    )
+      dx, dy = int(action[0]), int(action[1])
+    if self.profiler is not None: start = perf_counter()
+    # update the row of the agent in the store directly, making sure we don't leave the grid
+    pos, row, last = self.store.pos, self.agent.state.row, self.size - 1
+    pos[row, 0] = min(max(int(pos[row, 0]) + dx, 0), last)
+    pos[row, 1] = min(max(int(pos[row, 1]) + dy, 0), last)
+    if self.profiler is not None: self.profiler.record("step", start)
+
+  def step_path(self, deltas: np.ndarray) -> int:
+    """
+    Applies a whole trajectory, given as a (T, 2) array of unit steps, in one call.
+    The steps are checked against the navigation grid and the agent stops before
+    the first one that would go through a wall or a closed door. Returns the number
+    of steps taken.
+    """
+    if self.profiler is not None: start = perf_counter()
+    cells, n = self.nav.walk(tuple(self.agent.state.p_pos), deltas)
+    if n > 0: self.agent.state.p_pos = cells[n - 1]
+    self.publish()
+    if self.profiler is not None: self.profiler.record("step_path", start, steps=n, blocked=n < len(cells))
+    return n
+
+  def publish(self):
+    """
+    Publishes an immutable snapshot of the entities with a new version. Call it
+    after changing the world: other threads only read `self.snapshot`, which is
+    replaced at once, so they never see a change half done.
+    """
+    self.version += 1
+    self.snapshot = self.store.snapshot(self.version, self.epoch)
 
 
   def reset(self, seed=None):
-    # out of date
-    raise NotImplementedError("out of date")
-    # random seed
-    np.random.seed(seed)
-
+    """
+    Starts a new episode in the same layout without rebuilding anything: doors are
+    closed again, held items are put back and the agent, keys and objects get new
+    random positions. They are drawn in the same order as when the world was built,
+    so `reset(seed)` places them like a world built after `np.random.seed(seed)`.
+    """
+    if seed is not None: np.random.seed(seed)
+
+    # close the doors and restore the navigation grid
+    self.store.open[:] = self._initial_open
+    self.nav.walkable[:] = self._initial_walkable
+    self.nav.moves[:] = self._initial_moves
+    # put the keys and objects back in the room they start in
+    for item, room in self._spawn:
+      item.state.p_pos = self.random_pos(room.dimensions)
+      item.draw_entity = True
+      if isinstance(item, Key): item.inroom = room
+      else: item.room = room
+      self.entities.move(item, room=room.name, cell=tuple(item.state.p_pos))
     # set random location of agent always in main_room
-    self.agent.state.p_pos = np.random.randint(self.rooms['room_0'].size, self.size-1, (2,))
-    # init first key always in main_room
-    self.keys['key_0'].state.p_pos = np.random.randint(self.rooms['room_0'].size, self.size-1, (2,))
-    self.keys['key_0'].draw_entity = True
-    self.keys['key_0'].room = self.rooms['main_room']
-    # init second key always in room_0 
-    self.keys['key_1'].state.p_pos = np.random.randint(0, self.rooms['room_0'].size-1, (2,))
-    self.keys['key_1'].draw_entity = True
-    self.keys['key_1'].room = self.rooms['room_0']
-    self.rooms['room_0'].door.key = self.keys['key_0']
-    self.rooms['room_0'].door.open = False
-    # set random location of all keys apart from first 2
-    for obj in list(self.keys.values())[2:]:
-      obj.state.p_pos = np.random.randint(0, self.size-1, (2, ))
-      obj.draw_entity = True
-      if np.any(obj.state.p_pos > self.rooms['room_0'].size-1):
-        obj.room = self.rooms['main_room']
-      else:
-        obj.room = self.rooms['room_0']
+    self.agent.state.p_pos = np.random.randint(self.size//2, self.size-1, (2,))
 
-    # init  graph
-    self.graph = self._init_graph()
+    self.door_state = self._init_door_state()
+    self._init_visibility()
+    self.path_cache.invalidate()
+    self.trajectory = []
+    # the walls are kept, the renderer draws the entities again (in its own thread) when it sees the new epoch
+    self.epoch += 1
+    self.publish()
 
     return self._get_obs(), self._get_info()
 
-
   def _get_obs(self):
-    # return position of agent and keys
-    return {entity.name: entity.state.p_pos for entity in [self.agent]+list(self.keys.values())}
+    # return position of agent and keys (copies, the store keeps changing)
+    return dict(zip(self._obs_names, self.store.pos[self._obs_rows]))
 
   def _get_info(self):
     # added this function to be conformed with gymnasium's way of doing
     return None
 
+  def validate_plan(self, calls):
+    """
+    Checks a list of GPT function calls, given as (function name, arguments), against
+    the world state before any of them is run. Returns the first problem found or None.
+    """
+    held = {e.name for e in list(self.keys.values()) + list(self.objects.values()) if not e.draw_entity}
+    for i, (name, args) in enumerate(calls):
+      step = f"Step {i+1} {name}({', '.join(args)})"
+      if name == "MOVETO" and args[0] not in self.entities:
+        return f"{step}: there is nothing called {args[0]}"
+      if name in ("PICKUP", "PUTDOWN") and args[0] not in self.keys and args[0] not in self.objects:
+        return f"{step}: there is no object or key called {args[0]}"
+      if name == "PICKUP":
+        if args[0] in held: return f"{step}: {args[0]} is already picked"
+        held.add(args[0])
+      if name == "PUTDOWN":
+        if args[0] not in held: return f"{step}: {args[0]} has to be picked before putting it down"
+        held.remove(args[0])
+      if name == "OPENDOOR":
+        door_name, key_name = args
+        if not isinstance(self.entities.get(door_name), Door): return f"{step}: there is no door called {door_name}"
+        if key_name not in self.keys: return f"{step}: there is no key called {key_name}"
+        if key_name not in held: return f"{step}: {key_name} has to be picked before opening {door_name}"
+        if self.entities[door_name].key.name != key_name: return f"{step}: {door_name} can't be opened with {key_name}"
+      if name == "FINISHED" and i != len(calls) - 1:
+        return f"{step}: FINISHED has to be the last call"
+    return None
+
+  def summary(self):
+    # short description of the world state, used in place of old conversation turns
+    names = lambda entities: ", ".join(e.name for e in entities) or "none"
+    keys, objects = self.keys.values(), self.objects.values()
+    rooms = [room for room in self.rooms.values() if not room.name.startswith("main")]
+    return (f"Open doors: {names(r.door for r in rooms if r.door.open)}. "
+            f"Closed doors: {names(r.door for r in rooms if not r.door.open)}. "
+            f"Held items: {names(e for e in list(keys) + list(objects) if not e.draw_entity)}. "
+            f"Known keys: {names(k for k in keys if k.inroom.door.open)}. "
+            f"Known objects: {names(o for o in objects if o.room.door.open)}.")
+
+  @property
+  def renderer(self):
+    # pygame is only loaded by worlds that are drawn
+    if self._renderer is None:
+      from gym_env.utils.renderer import Renderer
+      self._renderer = Renderer(self)
+    return self._renderer
+
   def render(self):
     pass
 
   def _render_frame(self):
-    # create canvas to draw on
-    canvas = pygame.Surface((self.window_size, self.window_size))
-    canvas.fill((255, 255, 255))
-    # draw keys
-    for obj in self.keys.values():
-      obj.draw(canvas, self.pix_square_size)
-      # draw name of key
-      font = pygame.font.Font('freesansbold.ttf', 18)
-      text = font.render(obj.name, True, (0, 0, 0))
-      textRect = text.get_rect()
-      textRect.center = (obj.state.p_pos[0]*self.pix_square_size, obj.state.p_pos[1]*self.pix_square_size)
-      canvas.blit(text, textRect)
-
-    # draw rooms
-    for room in self.rooms.values():
-      room.draw(canvas, self.pix_square_size)
-    # draw agent
-    self.agent.draw(canvas, self.pix_square_size)
-
-    for obj in self.objects.values():
-      # plot the objects with name labels
-      obj.draw(canvas, self.pix_square_size)
-      # draw name of object
-      font = pygame.font.Font('freesansbold.ttf', 18)
-      text = font.render(obj.name, True, (0, 0, 0))
-      textRect = text.get_rect()
-      textRect.center = (obj.state.p_pos[0]*self.pix_square_size, obj.state.p_pos[1]*self.pix_square_size)
-      canvas.blit(text, textRect)
-
-
+    # redraw the parts of the canvas that changed since last frame
+    if self.profiler is None:
+      return self.renderer.render()
+    start = perf_counter()
+    canvas = self.renderer.render()
+    self.profiler.record("render_frame", start, dirty_rects=len(self.renderer.dirty_rects), skipped=not self.renderer.dirty_rects)
     return canvas
-
-    
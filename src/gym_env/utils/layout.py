@@ -0,0 +1,133 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+
+from typing import Dict, List, Optional
+
+from gym_env.utils.navigation import OccupancyGrid
+
+# bumped when the compiled format or the way rooms are laid out changes
+LAYOUT_VERSION = 1
+# kinds of items
+KEY, OBJECT = 0, 1
+ARRAYS = ["room_dims", "door_cells", "item_kind", "item_room", "item_forroom", "walkable", "region", "moves", "door_edges"]
+
+class Layout:
+  """
+  Static part of a world compiled from the rooms of a config and the grid size:
+   * room_dims: (R, 4) rectangles of the rooms (main room first, ids as `Room.i`)
+   * door_cells: (R, 2) cell of the door of each room
+   * item_kind, item_room, item_forroom: (M,) keys and objects in the order they are
+     placed, the room they start in and the room a key opens (-1 for objects)
+   * walkable, region, moves, door_edges: navigation grid with the doors closed
+  Saved as a directory of .npy files that are memory-mapped when loaded, so that
+  worlds (and processes) built from it share the pages instead of copying them.
+  """
+  def __init__(self, size: int, room_names: List[str], item_names: List[str], arrays: Dict[str, np.ndarray], path: Optional[str] = None):
+    self.size = size
+    self.room_names = room_names
+    self.item_names = item_names
+    for name in ARRAYS:
+      setattr(self, name, arrays[name])
+    # directory the layout was loaded from (None if compiled in memory)
+    self.path = path
+
+  def nav(self) -> OccupancyGrid:
+    # navigation grid of a new world, the arrays it changes when opening rooms are private to it
+    if self.path is None:
+      walkable, moves = self.walkable.copy(), self.moves.copy()
+    else:
+      # copy-on-write mappings: only the pages written to are copied
+      walkable, moves = (np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="c") for name in ("walkable", "moves"))
+    return OccupancyGrid.from_arrays(walkable, self.region, moves, [tuple(map(tuple, edge)) for edge in self.door_edges.tolist()])
+
+  def save(self, path: str):
+    # writes the layout to the directory `path`, which must not exist
+    os.makedirs(path)
+    for name in ARRAYS:
+      np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+    with open(os.path.join(path, "meta.json"), "w") as f:
+      json.dump({"version": LAYOUT_VERSION, "size": self.size, "room_names": self.room_names, "item_names": self.item_names}, f)
+
+  @classmethod
+  def load(cls, path: str, mmap_mode: str = "r") -> "Layout":
+    with open(os.path.join(path, "meta.json")) as f:
+      meta = json.load(f)
+    assert meta["version"] == LAYOUT_VERSION, f"{path} was compiled with layout version {meta['version']}"
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in ARRAYS}
+    return cls(meta["size"], meta["room_names"], meta["item_names"], arrays, path=path)
+
+def config_hash(cfg, size: int) -> str:
+  # only the rooms of the config and the size change the layout (omegaconf is slow to import, only needed here)
+  from omegaconf import OmegaConf
+  rooms = OmegaConf.to_container(cfg.rooms, resolve=True)
+  return hashlib.sha256(json.dumps({"version": LAYOUT_VERSION, "size": size, "rooms": rooms}, sort_keys=True).encode()).hexdigest()[:16]
+
+def compile_layout(cfg, size: int) -> Layout:
+  # lays out rooms, doors and items as `World` does, the main room covers the bottom half
+  room_names, room_dims = ["main_room"], [(0, size//2, size, size)]
+  room_size = size // len(cfg.rooms)
+  for i, room in enumerate(cfg.rooms):
+    if room.name == "main_room": continue
+    room_names.append(room.name)
+    room_dims.append((room_size*(i-1), 0, room_size*i, size//2))
+  room_ids = {name: i for i, name in enumerate(room_names)}
+  # door in the middle of the bottom wall
+  door_cells = [((xa + xb) // 2, yb) for xa, ya, xb, yb in room_dims]
+
+  item_names, item_kind, item_room, item_forroom = [], [], [], []
+  for room in cfg.rooms:
+    for key in room.doorkeys:
+      item_names.append(key.name); item_kind.append(KEY); item_room.append(room_ids[room.name]); item_forroom.append(room_ids[key.forroom])
+    for obj in room.objects:
+      item_names.append(obj.name); item_kind.append(OBJECT); item_room.append(room_ids[room.name]); item_forroom.append(-1)
+
+  # cells of closed rooms are not walkable, the door connects the main room to the cell right above it
+  nav = OccupancyGrid(size)
+  for i, (name, dims, door) in enumerate(zip(room_names, room_dims, door_cells)):
+    if name.startswith("main"): continue
+    nav.add_room(i, dims, walkable=False)
+    nav.add_door(door, (door[0], door[1] - 1))
+  nav.build()
+
+  arrays = {
+    "room_dims": np.array(room_dims, dtype=np.int64).reshape(-1, 4),
+    "door_cells": np.array(door_cells, dtype=np.int64).reshape(-1, 2),
+    "item_kind": np.array(item_kind, dtype=np.uint8),
+    "item_room": np.array(item_room, dtype=np.int16),
+    "item_forroom": np.array(item_forroom, dtype=np.int16),
+    "walkable": nav.walkable,
+    "region": nav.region,
+    "moves": nav.moves,
+    "door_edges": np.array(nav.doors, dtype=np.int64).reshape(-1, 2, 2),
+  }
+  return Layout(size, room_names, item_names, arrays)
+
+def load_layout(cfg, size: int, cache_dir: str) -> Layout:
+  """
+  Loads the compiled layout of the config from `cache_dir`, keyed by a hash of the
+  rooms and size, compiling it on a miss. Several processes can fill the cache at once.
+  Layouts are only mapped once per process.
+  """
+  path = os.path.join(cache_dir, config_hash(cfg, size))
+  if path in _loaded:
+    return _loaded[path]
+  if not os.path.isdir(path):
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=cache_dir)
+    compile_layout(cfg, size).save(os.path.join(tmp, "layout"))
+    try:
+      os.rename(os.path.join(tmp, "layout"), path)
+    except OSError:
+      # compiled by another process in the meantime
+      pass
+    finally:
+      shutil.rmtree(tmp, ignore_errors=True)
+  layout = _loaded[path] = Layout.load(path)
+  return layout
+
+# layouts loaded by this process, by path
+_loaded: Dict[str, Layout] = {}
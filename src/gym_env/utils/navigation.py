@@ -0,0 +1,221 @@
+import numpy as np
+from collections import OrderedDict
+
+from typing import List, Optional, Tuple
+
+# directions ordered as in `Action` (0: right, 1: up, 2: left, 3: down).
+# Bit `d` of `OccupancyGrid.moves[x, y]` is set if the agent can move from
+# (x, y) in direction `d`.
+DIRECTIONS = np.array([[1, 0], [0, 1], [-1, 0], [0, -1]])
+# direction of each unit step, indexed by (dx + 1, dy + 1) (-1 if it isn't a move)
+DELTA_TO_DIRECTION = np.full((3, 3), -1, dtype=np.int8)
+DELTA_TO_DIRECTION[DIRECTIONS[:, 0] + 1, DIRECTIONS[:, 1] + 1] = np.arange(4)
+
+class OccupancyGrid:
+  """
+  Navigation map of the world backed by NumPy arrays instead of a graph.
+  `walkable[x, y]` tells whether cell (x, y) can be stepped on and
+  `region[x, y]` is the id of the room the cell belongs to (0 for the main room).
+  Walls are implicit: the agent can only move between cells of different
+  regions through a door edge.
+  """
+  def __init__(self, size: int):
+    self.size = size
+    self.walkable = np.ones((size, size), dtype=bool)
+    self.region = np.zeros((size, size), dtype=np.int16)
+    # bitmask of allowed moves from each cell
+    self.moves = np.zeros((size, size), dtype=np.uint8)
+    # door edges as pairs of cells
+    self.doors: List[Tuple[Tuple[int, int], Tuple[int, int]]] = []
+    # offsets of neighbouring cells in the flattened (x, y) arrays
+    self._offsets = np.array([size, 1, -size, -1])
+
+  @classmethod
+  def from_arrays(cls, walkable: np.ndarray, region: np.ndarray, moves: np.ndarray, doors: List[Tuple[Tuple[int, int], Tuple[int, int]]]) -> "OccupancyGrid":
+    # grid over existing (e.g. memory-mapped) arrays, used without copies
+    grid = cls.__new__(cls)
+    grid.size = len(walkable)
+    grid.walkable, grid.region, grid.moves = walkable, region, moves
+    grid.doors = list(doors)
+    grid._offsets = np.array([grid.size, 1, -grid.size, -1])
+    return grid
+
+  def add_room(self, region: int, dimensions, walkable: bool):
+    # assigns the cells of the room to `region`
+    xa, ya, xb, yb = dimensions
+    self.region[xa:xb, ya:yb] = region
+    self.walkable[xa:xb, ya:yb] = walkable
+
+  def add_door(self, a: Tuple[int, int], b: Tuple[int, int]):
+    # door edge between two neighbouring cells in different regions
+    self.doors.append(((int(a[0]), int(a[1])), (int(b[0]), int(b[1]))))
+
+  def open_room(self, dimensions):
+    """
+    Makes the cells of a room walkable, updating the moves in place only around
+    the room. Since a room is only reachable through its door, opening it cannot
+    shorten any existing path: only targets that were unreachable can change.
+    """
+    xa, ya, xb, yb = dimensions
+    self.walkable[xa:xb, ya:yb] = True
+    # the cells right outside the room gain moves too (e.g. the door cell)
+    self._build(xa - 1, xb + 1, ya - 1, yb + 1)
+
+  def build(self):
+    # recompute the allowed moves of every cell
+    self._build(0, self.size, 0, self.size)
+
+  def _build(self, x0: int, x1: int, y0: int, y1: int):
+    # recompute the allowed moves of the cells in [x0, x1) x [y0, y1)
+    n = self.size
+    x0, x1, y0, y1 = max(x0, 0), min(x1, n), max(y0, 0), min(y1, n)
+    # neighbours of the window are needed to know which moves are allowed
+    ex0, ex1, ey0, ey1 = max(x0 - 1, 0), min(x1 + 1, n), max(y0 - 1, 0), min(y1 + 1, n)
+    w, r = self.walkable[ex0:ex1, ey0:ey1], self.region[ex0:ex1, ey0:ey1]
+    m = np.zeros(w.shape, dtype=np.uint8)
+    # moves along x
+    ok = w[:-1] & w[1:] & (r[:-1] == r[1:])
+    np.bitwise_or(m[:-1], 1, out=m[:-1], where=ok)
+    np.bitwise_or(m[1:], 4, out=m[1:], where=ok)
+    # moves along y
+    ok = w[:, :-1] & w[:, 1:] & (r[:, :-1] == r[:, 1:])
+    np.bitwise_or(m[:, :-1], 2, out=m[:, :-1], where=ok)
+    np.bitwise_or(m[:, 1:], 8, out=m[:, 1:], where=ok)
+    self.moves[x0:x1, y0:y1] = m[x0-ex0:x1-ex0, y0-ey0:y1-ey0]
+    # doors connect different regions
+    for a, b in self.doors:
+      inside = any(x0 <= c[0] < x1 and y0 <= c[1] < y1 for c in (a, b))
+      if inside and self.walkable[a] and self.walkable[b]:
+        self._link(a, b)
+
+  def _link(self, a: Tuple[int, int], b: Tuple[int, int]):
+    # allows moving between two neighbouring cells in both directions
+    d = int(np.flatnonzero((DIRECTIONS == np.subtract(b, a)).all(1))[0])
+    self.moves[a] |= 1 << d
+    self.moves[b] |= 1 << ((d + 2) % 4)
+
+  def walk(self, source: Tuple[int, int], deltas: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Checks a whole trajectory, given as a (T, 2) array of unit steps from `source`,
+    against the allowed moves at once. Returns the (T, 2) cells visited and the
+    number of steps that can be taken before the first collision.
+    """
+    deltas = np.asarray(deltas).reshape(-1, 2)
+    cells = np.cumsum(deltas, axis=0) + source
+    if len(deltas) == 0: return cells, 0
+    # cell each step starts from
+    prev = np.empty_like(cells)
+    prev[0], prev[1:] = source, cells[:-1]
+    unit = (np.abs(deltas) <= 1).all(1)
+    direction = np.where(unit, DELTA_TO_DIRECTION[np.clip(deltas[:, 0] + 1, 0, 2), np.clip(deltas[:, 1] + 1, 0, 2)], -1)
+    inside = ((prev >= 0) & (prev < self.size)).all(1)
+    allowed = self.moves[np.clip(prev[:, 0], 0, self.size - 1), np.clip(prev[:, 1], 0, self.size - 1)]
+    ok = inside & (direction >= 0) & ((allowed >> np.maximum(direction, 0)) & 1 == 1)
+    return cells, len(ok) if ok.all() else int(np.argmin(ok))
+
+  def in_bounds(self, cell: Tuple[int, int]) -> bool:
+    return 0 <= cell[0] < self.size and 0 <= cell[1] < self.size
+
+  def shortest_path(self, source: Tuple[int, int], target: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
+    """
+    Breadth first search over the grid, expanding a whole frontier at a time.
+    Returns the waypoints from source (excluded) to target (included) or None
+    if the target cannot be reached.
+    """
+    source = (int(source[0]), int(source[1]))
+    target = (int(target[0]), int(target[1]))
+    if not (self.in_bounds(source) and self.in_bounds(target)): return None
+    if not self.walkable[target]: return None
+    if source == target: return []
+
+    n = self.size
+    moves = self.moves.ravel()
+    src, dst = source[0]*n + source[1], target[0]*n + target[1]
+    # direction used to reach each cell (-1 if not reached yet)
+    came_from = np.full(n*n, -1, dtype=np.int8)
+    came_from[src] = 4
+    frontier = np.array([src])
+    while frontier.size > 0 and came_from[dst] < 0:
+      cell_moves = moves[frontier]
+      expanded = []
+      for d, offset in enumerate(self._offsets):
+        nxt = frontier[(cell_moves >> d) & 1 == 1] + offset
+        nxt = nxt[came_from[nxt] < 0]
+        came_from[nxt] = d
+        expanded.append(nxt)
+      frontier = np.concatenate(expanded)
+
+    if came_from[dst] < 0: return None
+
+    # walk back from target to source
+    path = []
+    cell = dst
+    while cell != src:
+      path.append((int(cell // n), int(cell % n)))
+      cell -= self._offsets[came_from[cell]]
+    path.reverse()
+    return path
+
+class PathCache:
+  """
+  LRU cache of planned paths between cells, keyed on the door state (bitmask
+  of the open doors). Opening a door only adds a dead end room to the map, so
+  a path planned with some doors open is still the shortest one when more
+  doors are open: it is reused for any door state containing the one it was
+  planned with. Unreachable targets are only reused for the same door state.
+  """
+  def __init__(self, max_size: int = 1024):
+    self.max_size = max_size
+    # (source, target) -> (door state, path or None if unreachable)
+    self.paths: "OrderedDict[Tuple, Tuple[int, Optional[List]]]" = OrderedDict()
+    # counters
+    self.hits = 0
+    self.misses = 0
+
+  def get(self, source: Tuple[int, int], target: Tuple[int, int], door_state: int) -> Optional[List[Tuple[int, int]]]:
+    # returns the cached path (None if unreachable), raises KeyError on a miss
+    path = self._lookup(source, target, door_state)
+    if path is not _MISS:
+      self.hits += 1
+      return path
+    # a path in the opposite direction can be walked backwards
+    path = self._lookup(target, source, door_state)
+    if path is not _MISS:
+      self.hits += 1
+      return None if path is None else path[-2::-1] + [target]
+    self.misses += 1
+    raise KeyError((source, target))
+
+  def _lookup(self, source, target, door_state):
+    entry = self.paths.get((source, target))
+    if entry is None: return _MISS
+    state, path = entry
+    valid = state == door_state if path is None else state & door_state == state
+    if not valid: return _MISS
+    self.paths.move_to_end((source, target))
+    return path
+
+  def put(self, source: Tuple[int, int], target: Tuple[int, int], door_state: int, path: Optional[List[Tuple[int, int]]]):
+    self.paths[(source, target)] = (door_state, path)
+    self.paths.move_to_end((source, target))
+    if len(self.paths) > self.max_size:
+      self.paths.popitem(last=False)
+
+  def invalidate(self, cell: Optional[Tuple[int, int]] = None, unreachable: bool = False):
+    """
+    Drops the entries starting or ending at `cell`, or the ones of unreachable
+    targets if `unreachable` is set. Drops everything if called without arguments.
+    """
+    if cell is None and not unreachable:
+      self.paths.clear()
+      return
+    stale = [k for k, (_, path) in self.paths.items() if (cell is not None and cell in k) or (unreachable and path is None)]
+    for k in stale:
+      del self.paths[k]
+
+  def stats(self):
+    total = self.hits + self.misses
+    return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0, "size": len(self.paths)}
+
+# marks a cache miss (None is a cached unreachable target)
+_MISS = object()
@@ -0,0 +1,61 @@
+import json
+import threading
+from time import perf_counter
+from collections import deque
+
+from typing import Dict, List
+
+class Profiler:
+  """
+  Records timed events of an episode (name, start, duration and fields such as path
+  length or tokens) into a ring buffer that keeps the last `capacity` ones. The
+  instrumented code only checks whether a profiler is attached (None by default),
+  so there is no overhead beyond that check when profiling is off:
+      world.profiler = robot.profiler = Profiler()
+      ...
+      profiler.export_chrome_trace("episode.json")  # open in chrome://tracing or Perfetto
+  Events can be recorded from several threads (e.g. the render thread).
+  """
+  def __init__(self, capacity: int = 100000):
+    self.events = deque(maxlen=capacity)
+    # events are timed relative to the creation of the profiler
+    self.t0 = perf_counter()
+
+  def record(self, name: str, start: float, **fields):
+    # event that started at `start` (a `perf_counter()` value) and ends now
+    end = perf_counter()
+    self.events.append((name, start - self.t0, end - start, threading.get_ident(), fields))
+
+  def clear(self):
+    self.events.clear()
+
+  def summary(self) -> Dict[str, Dict[str, float]]:
+    # count, total and mean duration of each event, with the totals of their numeric fields
+    summary = {}
+    for name, _, duration, _, fields in list(self.events):
+      s = summary.setdefault(name, {"count": 0, "total_s": 0.0})
+      s["count"] += 1
+      s["total_s"] += duration
+      for key, value in fields.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+          s[key] = s.get(key, 0) + value
+    for s in summary.values():
+      s["mean_s"] = s["total_s"] / s["count"]
+    return summary
+
+  def to_dicts(self) -> List[dict]:
+    return [{"name": name, "start_s": start, "duration_s": duration, "thread": thread, **fields}
+            for name, start, duration, thread, fields in list(self.events)]
+
+  def export_jsonl(self, path: str):
+    # one event per line
+    with open(path, "w") as f:
+      for event in self.to_dicts():
+        f.write(json.dumps(event, default=str) + "\n")
+
+  def export_chrome_trace(self, path: str):
+    # complete events ("ph": "X") of the Trace Event Format, times in microseconds
+    events = [{"name": name, "ph": "X", "ts": start * 1e6, "dur": duration * 1e6, "pid": 0, "tid": thread, "args": fields}
+              for name, start, duration, thread, fields in list(self.events)]
+    with open(path, "w") as f:
+      json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
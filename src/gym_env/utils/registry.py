@@ -0,0 +1,87 @@
+from typing import Dict, List, Optional, Tuple
+
+class EntityRegistry:
+  """
+  Single store of the entities of a world, indexed by name, integer id (order
+  of registration), type, containing room and grid cell. Entities that are not
+  on the grid (rooms, picked objects) have no cell.
+  """
+  def __init__(self):
+    self.by_name: Dict[str, object] = {}
+    self.by_id: List[object] = []
+    self._by_type: Dict[type, Dict[str, object]] = {}
+    self._by_room: Dict[str, Dict[str, object]] = {}
+    self._by_cell: Dict[Tuple[int, int], Dict[str, object]] = {}
+    # where each entity (by name) is indexed
+    self._ids: Dict[str, int] = {}
+    self._rooms: Dict[str, Optional[str]] = {}
+    self._cells: Dict[str, Optional[Tuple[int, int]]] = {}
+
+  def add(self, entity, room: Optional[str] = None, cell: Optional[Tuple[int, int]] = None) -> int:
+    # registers the entity and returns its id
+    assert entity.name not in self.by_name, f"{entity.name} is already registered"
+    self.by_name[entity.name] = entity
+    self._ids[entity.name] = len(self.by_id)
+    self.by_id.append(entity)
+    self._by_type.setdefault(type(entity), {})[entity.name] = entity
+    self._rooms[entity.name] = self._cells[entity.name] = None
+    self.move(entity, room=room, cell=cell)
+    return self._ids[entity.name]
+
+  def move(self, entity, room: Optional[str] = None, cell: Optional[Tuple[int, int]] = None):
+    # updates the room and cell indexes of the entity (`cell` None removes it from the grid)
+    name = entity.name
+    old_room, old_cell = self._rooms[name], self._cells[name]
+    if old_room is not None: del self._by_room[old_room][name]
+    if old_cell is not None:
+      del self._by_cell[old_cell][name]
+      if not self._by_cell[old_cell]: del self._by_cell[old_cell]
+    if cell is not None: cell = (int(cell[0]), int(cell[1]))
+    self._rooms[name], self._cells[name] = room, cell
+    if room is not None: self._by_room.setdefault(room, {})[name] = entity
+    if cell is not None: self._by_cell.setdefault(cell, {})[name] = entity
+
+  def id(self, entity) -> int:
+    return self._ids[entity.name]
+
+  def room_of(self, entity) -> Optional[str]:
+    return self._rooms[entity.name]
+
+  def cell_of(self, entity) -> Optional[Tuple[int, int]]:
+    return self._cells[entity.name]
+
+  def of_type(self, cls) -> list:
+    # entities that are instances of `cls`, in order of registration
+    return sorted((e for t, d in self._by_type.items() if issubclass(t, cls) for e in d.values()), key=self.id)
+
+  def in_room(self, room: str) -> list:
+    return list(self._by_room.get(room, {}).values())
+
+  def at(self, cell: Tuple[int, int]) -> list:
+    # entities on grid cell (x, y)
+    return list(self._by_cell.get((int(cell[0]), int(cell[1])), {}).values())
+
+  # dict-like access by name
+  def __getitem__(self, name: str):
+    return self.by_name[name]
+
+  def __contains__(self, name: str) -> bool:
+    return name in self.by_name
+
+  def __iter__(self):
+    return iter(self.by_name)
+
+  def __len__(self) -> int:
+    return len(self.by_name)
+
+  def get(self, name: str, default=None):
+    return self.by_name.get(name, default)
+
+  def keys(self):
+    return self.by_name.keys()
+
+  def values(self):
+    return self.by_name.values()
+
+  def items(self):
+    return self.by_name.items()
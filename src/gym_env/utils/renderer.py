@@ -0,0 +1,161 @@
+import pygame
+import numpy as np
+
+from typing import Dict, Iterable, List, Tuple
+
+LabelKey = Tuple[str, Tuple[int, int, int], int]
+# entity name labels are black
+LABEL_COLOR, LABEL_SIZE = (0, 0, 0), 18
+
+class LabelCache:
+  """
+  Loads each font once and keeps the rasterized name labels, keyed by
+  (text, color, size), so they are only blitted when drawing a frame.
+  """
+  def __init__(self, font_name: str = 'freesansbold.ttf'):
+    self.font_name = font_name
+    self.fonts: Dict[int, pygame.font.Font] = {}
+    self.labels: Dict[LabelKey, pygame.Surface] = {}
+
+  def font(self, size: int) -> pygame.font.Font:
+    if size not in self.fonts:
+      if not pygame.font.get_init(): pygame.font.init()
+      self.fonts[size] = pygame.font.Font(self.font_name, size)
+    return self.fonts[size]
+
+  def get(self, text: str, color: Tuple[int, int, int] = LABEL_COLOR, size: int = LABEL_SIZE) -> pygame.Surface:
+    key = (text, color, size)
+    label = self.labels.get(key)
+    if label is None:
+      label = self.labels[key] = self.font(size).render(text, True, color)
+    return label
+
+  def retain(self, keys: Iterable[LabelKey]):
+    # evicts the labels that are not in `keys` (e.g. of removed or renamed entities)
+    keys = set(keys)
+    for key in [k for k in self.labels if k not in keys]:
+      del self.labels[key]
+
+class Renderer:
+  """
+  Retained mode renderer of a `World`. Room walls are drawn once on a static
+  background layer, entities are drawn on top of it and, from one frame to the
+  next, only the rectangles of the entities that changed are redrawn. Entities are
+  drawn from the last snapshot published by the world, never from the live state,
+  and frames are skipped while its version doesn't change.
+  """
+  def __init__(self, world):
+    self.world = world
+    # static layer with the room walls and persistent canvas drawn on
+    self.background: pygame.Surface = None
+    self.canvas: pygame.Surface = None
+    self.labels = LabelCache()
+    # entity -> (state it was drawn with, rect it covers on the canvas)
+    self._drawn = {}
+    # rects of the canvas updated by the last call to `render`
+    self.dirty_rects: List[pygame.Rect] = []
+    # version and epoch of the snapshot drawn on the canvas
+    self.version = None
+    self.epoch = None
+
+  def invalidate(self, layout: bool = False):
+    # forces a full redraw on the next frame (of the walls too if the `layout` changed),
+    # only call it from the thread rendering (the world signals resets with the snapshot epoch)
+    self.canvas = None
+    if layout: self.background = None
+
+  def _init_layers(self):
+    # draw room walls on the background
+    if self.background is None:
+      self.background = pygame.Surface((self.world.window_size, self.world.window_size))
+      self.background.fill((255, 255, 255))
+      for room in self.world.rooms.values():
+        room.draw_walls(self.background, self.world.pix_square_size)
+    self.canvas = self.background.copy()
+    self._drawn = {}
+
+  def _items(self):
+    # entities in drawing order with how to draw them
+    world = self.world
+    return ([(key, "label") for key in world.keys.values()] +
+            [(room.door, "door") for room in world.rooms.values()] +
+            [(world.agent, "plain")] +
+            [(obj, "label") for obj in world.objects.values()])
+
+  def _state(self, view):
+    # everything that changes how an entity looks
+    return (view.name, tuple(view.p_pos), view.draw_entity, view.open)
+
+  def _rect(self, entity, kind: str) -> pygame.Rect:
+    # area of the canvas covered by the entity (and its label)
+    pix = self.world.pix_square_size
+    pos = entity.state.p_pos - np.array([0, 0.5]) if kind == "door" else entity.state.p_pos
+    # margin for rounding and wall/door overlap
+    rect = pygame.Rect(pos * pix, (pix, pix)).inflate(4, 4)
+    if kind == "label":
+      label = self.labels.get(entity.name).get_rect()
+      label.center = (entity.state.p_pos[0]*pix, entity.state.p_pos[1]*pix)
+      rect = rect.union(label)
+    return rect
+
+  def _draw(self, entity, kind: str, view):
+    # the draw method of the entity only reads attributes that the view has too
+    type(entity).draw(view, self.canvas, self.world.pix_square_size)
+    if kind == "label":
+      # draw name of entity
+      text = self.labels.get(entity.name)
+      textRect = text.get_rect()
+      textRect.center = (entity.state.p_pos[0]*self.world.pix_square_size, entity.state.p_pos[1]*self.world.pix_square_size)
+      self.canvas.blit(text, textRect)
+
+  def render(self) -> pygame.Surface:
+    """
+    Redraws the regions of the canvas that changed since the last call and
+    stores them in `self.dirty_rects`. Can run in another thread than the one
+    changing the world.
+    """
+    snapshot = self.world.snapshot
+    # the world was reset since the last frame
+    full = self.canvas is None or snapshot.epoch != self.epoch
+    if not full and snapshot.version == self.version:
+      # nothing was published since the last frame
+      self.dirty_rects = []
+      return self.canvas
+    if full: self._init_layers()
+    self.version, self.epoch = snapshot.version, snapshot.epoch
+    dirty = [self.canvas.get_rect()] if full else []
+
+    # find entities that changed since they were last drawn
+    items = self._items()
+    views = [snapshot.view(entity) for entity, _ in items]
+    rects = []
+    renamed = False
+    for (entity, kind), view in zip(items, views):
+      state = self._state(view)
+      drawn = self._drawn.get(entity)
+      if drawn is None or drawn[0] != state:
+        renamed |= drawn is None or drawn[0][0] != state[0]
+        rect = self._rect(view, kind)
+        if not full:
+          if drawn is not None: dirty.append(drawn[1])
+          dirty.append(rect)
+        drawn = self._drawn[entity] = (state, rect)
+      rects.append(drawn[1])
+
+    # forget removed entities and the labels nobody uses anymore
+    if renamed or len(self._drawn) != len(items):
+      present = {entity for entity, _ in items}
+      for entity in [e for e in self._drawn if e not in present]:
+        dirty.append(self._drawn.pop(entity)[1])
+      self.labels.retain((entity.name, LABEL_COLOR, LABEL_SIZE) for entity, kind in items if kind == "label")
+
+    # restore background and redraw all entities overlapping the dirty rects
+    for rect in dirty:
+      self.canvas.set_clip(rect)
+      self.canvas.blit(self.background, rect, rect)
+      for i in rect.collidelistall(rects):
+        self._draw(*items[i], views[i])
+    self.canvas.set_clip(None)
+
+    self.dirty_rects = dirty
+    return self.canvas
@@ -0,0 +1,72 @@
+import numpy as np
+
+class EntityStore:
+  """
+  State of all the entities of a world as struct-of-arrays: position, visibility,
+  color, id of the containing room and whether it's open (doors), one row per entity. Entities only hold their
+  row, so that the state of thousands of entities can be read and written at once.
+  The arrays are reallocated when full, don't keep views on them across `add`.
+  """
+  def __init__(self, capacity: int = 16):
+    self.n = 0
+    self.pos = np.zeros((capacity, 2), dtype=np.int64)
+    self.visible = np.ones(capacity, dtype=bool)
+    self.color = np.zeros((capacity, 3), dtype=np.uint8)
+    self.room = np.full(capacity, -1, dtype=np.int16)
+    self.open = np.zeros(capacity, dtype=bool)
+
+  def add(self) -> int:
+    # returns the row of a new entity
+    if self.n == len(self.pos):
+      self._grow(2 * len(self.pos))
+    self.n += 1
+    return self.n - 1
+
+  def _grow(self, capacity: int):
+    for name, fill in (("pos", 0), ("visible", True), ("color", 0), ("room", -1), ("open", False)):
+      old = getattr(self, name)
+      new = np.full((capacity,) + old.shape[1:], fill, dtype=old.dtype)
+      new[:len(old)] = old
+      setattr(self, name, new)
+
+  def nbytes(self) -> int:
+    return self.pos.nbytes + self.visible.nbytes + self.color.nbytes + self.room.nbytes + self.open.nbytes
+
+  def snapshot(self, version: int, epoch: int = 0) -> "WorldSnapshot":
+    # frozen copy of the rows in use
+    n = self.n
+    return WorldSnapshot(version, epoch, self.pos[:n].copy(), self.visible[:n].copy(), self.color[:n].copy(), self.open[:n].copy())
+
+class WorldSnapshot:
+  """
+  Immutable copy of the entity state of a world at one point in time. The world
+  publishes a new one, with a higher version, after each change, so that another
+  thread (e.g. the renderer) can read a consistent state without locks. The
+  `epoch` is increased when the world is reset, readers redraw everything then.
+  """
+  __slots__ = ("version", "epoch", "pos", "visible", "color", "open")
+
+  def __init__(self, version: int, epoch: int, pos: np.ndarray, visible: np.ndarray, color: np.ndarray, open: np.ndarray):
+    # the arrays are owned by the snapshot and made read-only
+    pos.flags.writeable = visible.flags.writeable = color.flags.writeable = open.flags.writeable = False
+    self.version, self.epoch, self.pos, self.visible, self.color, self.open = version, epoch, pos, visible, color, open
+
+  def view(self, entity) -> "EntityView":
+    # the entity as it was when the snapshot was taken
+    row = entity.state.row
+    return EntityView(entity.name, self.pos[row], bool(self.visible[row]), tuple(int(c) for c in self.color[row]),
+                      bool(self.open[row]) if hasattr(entity, "open") else None)
+
+class EntityView:
+  """
+  Read-only entity state from a snapshot, with the attributes the `draw` methods of
+  the entities use, so that they can draw it in place of the live entity.
+  """
+  __slots__ = ("name", "p_pos", "draw_entity", "color", "open")
+
+  def __init__(self, name, p_pos, draw_entity, color, open):
+    self.name, self.p_pos, self.draw_entity, self.color, self.open = name, p_pos, draw_entity, color, open
+
+  @property
+  def state(self):
+    return self
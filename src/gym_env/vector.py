@@ -0,0 +1,128 @@
+import numpy as np
+import gymnasium as gym
+from gymnasium import spaces
+
+from gym_env.utils.core import World
+from gym_env.utils.navigation import DIRECTIONS, OccupancyGrid
+
+class VectorGridWorldEnv(gym.vector.VectorEnv):
+    """
+    Runs `num_envs` worlds with the same layout in lockstep. The state of all
+    worlds is kept in struct-of-arrays form so that a step of every world is a
+    handful of NumPy operations:
+     * agent_pos: (N, 2) position of the agent in each world
+     * door_open: (N, R) whether the door of each room is open (room ids as `Room.i`)
+     * entity_pos: (N, E, 2) position of keys and objects (keys first)
+     * picked: (N, E) whether the entity is held by the agent
+    Actions are the grid moves of `Action` (0: right, 1: up, 2: left, 3: down).
+    """
+    def __init__(self, num_envs, size=10, cfg=None, layout=None):
+        # a single world provides the static layout shared by all worlds
+        self.world = World(size=size, wait_time_s=0, cfg=cfg, fast_forward=True, layout=layout)
+        self.size = size
+        rooms = list(self.world.rooms.values())
+        self.entities = list(self.world.keys.values()) + list(self.world.objects.values())
+        n_rooms, n_entities = len(rooms), len(self.entities)
+
+        # moves allowed with all doors open, each world masks the rooms that are closed
+        nav = OccupancyGrid(size)
+        nav.region[:] = self.world.nav.region
+        nav.doors = list(self.world.nav.doors)
+        nav.build()
+        self._moves = nav.moves
+        self._region = nav.region
+        # door cell of each room and key (entity index) that opens it
+        self._door_cells = np.array([room.door.state.p_pos for room in rooms], dtype=int)
+        self._room_key = np.full(n_rooms, -1)
+        for e, entity in enumerate(self.entities):
+            if hasattr(entity, "forroom"):
+                self._room_key[entity.forroom.i] = e
+        self._initially_open = np.array([room.door.open for room in rooms])
+        # rooms where entities are sampled from
+        room_of = lambda entity: entity.inroom if hasattr(entity, "inroom") else entity.room
+        dims = np.array([room_of(entity).dimensions for entity in self.entities], dtype=int).reshape(-1, 4)
+        self._low, self._high = dims[:, :2], dims[:, 2:]
+
+        # state of all worlds
+        self.agent_pos = np.zeros((num_envs, 2), dtype=int)
+        self.door_open = np.zeros((num_envs, n_rooms), dtype=bool)
+        self.entity_pos = np.zeros((num_envs, n_entities, 2), dtype=int)
+        self.picked = np.zeros((num_envs, n_entities), dtype=bool)
+        self._envs = np.arange(num_envs)
+        self._actions = None
+        self.np_random = np.random.default_rng()
+
+        observation_space = spaces.Dict({
+            "agent": spaces.Box(0, size - 1, shape=(2,), dtype=int),
+            "entities": spaces.Box(0, size - 1, shape=(n_entities, 2), dtype=int),
+            "picked": spaces.MultiBinary(n_entities),
+            "doors": spaces.MultiBinary(n_rooms),
+        })
+        super().__init__(num_envs, observation_space, spaces.Discrete(4))
+
+    def _get_obs(self):
+        return {
+            "agent": self.agent_pos.copy(),
+            "entities": self.entity_pos.copy(),
+            "picked": self.picked.copy(),
+            "doors": self.door_open.copy(),
+        }
+
+    def reset_wait(self, seed=None, options=None):
+        if seed is not None:
+            self.np_random = np.random.default_rng(seed)
+        # agent always starts in main_room, entities in their room
+        self.agent_pos[:] = self.np_random.integers(self.size//2, self.size-1, self.agent_pos.shape)
+        self.entity_pos[:] = self.np_random.integers(self._low, self._high, self.entity_pos.shape)
+        self.door_open[:] = self._initially_open
+        self.picked[:] = False
+        return self._get_obs(), {}
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions, dtype=int)
+
+    def step_wait(self):
+        self.step_moves(self._actions)
+        n = self.num_envs
+        return self._get_obs(), np.zeros(n), np.zeros(n, dtype=bool), np.zeros(n, dtype=bool), {}
+
+    def step_moves(self, actions):
+        """
+        Moves the agent of every world one grid step. Moves through walls or
+        into closed rooms are ignored. Returns which agents moved.
+        """
+        pos = self.agent_pos
+        can = (self._moves[pos[:, 0], pos[:, 1]] >> actions) & 1 == 1
+        delta = DIRECTIONS[actions]
+        # the room entered has to be open in that world
+        target = np.where(can[:, None], pos + delta, pos)
+        can &= self.door_open[self._envs, self._region[target[:, 0], target[:, 1]]]
+        pos += delta * can[:, None]
+        return can
+
+    def pick(self, entity):
+        # agents pick `entity[n]` (index in `self.entities`, -1 for none) if they are on it
+        entity = np.asarray(entity)
+        e = np.maximum(entity, 0)
+        ok = (entity >= 0) & ~self.picked[self._envs, e] & (self.entity_pos[self._envs, e] == self.agent_pos).all(-1)
+        self.picked[self._envs[ok], e[ok]] = True
+        return ok
+
+    def drop(self, entity):
+        # agents drop the held `entity[n]` (-1 for none) where they are
+        entity = np.asarray(entity)
+        e = np.maximum(entity, 0)
+        ok = (entity >= 0) & self.picked[self._envs, e]
+        self.entity_pos[self._envs[ok], e[ok]] = self.agent_pos[ok]
+        self.picked[self._envs[ok], e[ok]] = False
+        return ok
+
+    def open(self, room):
+        # agents open the door of `room[n]` (-1 for none) if they hold its key and are at the door
+        room = np.asarray(room)
+        r = np.maximum(room, 0)
+        key = self._room_key[r]
+        ok = (room >= 0) & (key >= 0) & self.picked[self._envs, np.maximum(key, 0)]
+        ok &= (self._door_cells[r] == self.agent_pos).all(-1)
+        self.door_open[self._envs[ok], r[ok]] = True
+        return ok
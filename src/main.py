@@ -1,5 +1,7 @@
 from gym_env.simple import GridWorldEnv
+from gym_env.utils.layout import load_layout
 from abstract_robot.gpt_robot import GPTRobot
+from abstract_robot.history import HistoryManager
 import time
 import hydra
 from omegaconf import DictConfig
@@ -7,8 +9,9 @@ from omegaconf import DictConfig
 @hydra.main(version_base=None, config_path="../configs", config_name="simple_room")
 def run(cfg : DictConfig) -> None:
     print("starting")
-    # init env
-    env = GridWorldEnv(render_mode='human', size=100, wait_time_s=0.1, cfg=cfg)
+    # init env (the layout of the rooms is compiled once and then loaded from the cache)
+    layout = load_layout(cfg, 100, cfg.layout_cache) if cfg.get("layout_cache") else None
+    env = GridWorldEnv(render_mode=cfg.get("render_mode", "human"), size=100, wait_time_s=0.1, cfg=cfg, fast_forward=cfg.get("fast_forward", False), layout=layout)
     # start env
     # env.reset()
     env.run()
@@ -31,7 +34,11 @@ def run(cfg : DictConfig) -> None:
         isfinished = True
 
 
-    brain = GPTRobot(task_message, explore, pickup, moveto, putdown, opendoor, finished)
+    # old turns are replaced by a summary of the world so that prompts stay small
+    history = HistoryManager(summarize=env.world.summary)
+    # in plan mode the model can send several API calls at once, checked against the world before running them
+    brain = GPTRobot(task_message, explore, pickup, moveto, putdown, opendoor, finished, history=history,
+                     plan_mode=cfg.get("plan_mode", False), validate_plan=env.world.validate_plan)
     last_robot_message = None
     while not isfinished:
         print("next action")
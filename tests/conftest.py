@@ -0,0 +1,5 @@
+import os
+import sys
+
+# gym_env and abstract_robot are imported from src/, as when running from there
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
@@ -0,0 +1,79 @@
+import os
+import time
+import asyncio
+import numpy as np
+from omegaconf import OmegaConf
+
+from gym_env.utils.core import World
+from abstract_robot.gpt_robot import AsyncGPTRobot, GPTRobot
+from abstract_robot.llm import BoundedLLM, StubLLM
+
+CONFIG = os.path.join(os.path.dirname(__file__), "..", "configs", "simple_room.yaml")
+# key-door-object episode of configs/simple_room.yaml
+SCRIPT = ["EXPLORE()", "MOVETO(KeyA)", "PICKUP(KeyA)", "OPENDOOR(Door_Room1, KeyA)", "MOVETO(KeyB)",
+          "PICKUP(KeyB)", "OPENDOOR(Door_Room2, KeyB)", "MOVETO(Table)", "FINISHED"]
+LATENCY_S = 0.05
+
+class CountingLLM(StubLLM):
+    # StubLLM counting the calls awaited at the same time, over all the models sharing `counts`
+    def __init__(self, counts, answers=SCRIPT, latency_s=LATENCY_S):
+        super().__init__(answers, latency_s)
+        self.counts = counts
+
+    async def acomplete(self, messages):
+        self.counts["in_flight"] += 1
+        self.counts["peak"] = max(self.counts["peak"], self.counts["in_flight"])
+        try:
+            return await super().acomplete(messages)
+        finally:
+            self.counts["in_flight"] -= 1
+
+def make_robot(robot_class, llm, seed=0):
+    np.random.seed(seed)
+    world = World(100, 0, OmegaConf.load(CONFIG), fast_forward=True)
+    agent = world.agent
+    robot = robot_class("put the table in room2", agent.explore, agent.pick, agent.goto, agent.drop, agent.open,
+                        lambda: "finished", llm=llm)
+    return robot
+
+async def run_episode(robot):
+    answers, answer = [], None
+    while answer != "finished":
+        answer = await robot.next_action(answer)
+        answers.append(answer)
+    return answers
+
+def run_episodes(n_episodes, max_concurrency):
+    # all episodes on one loop, their model calls share one semaphore (timed once the robots are built)
+    counts = {"in_flight": 0, "peak": 0}
+    async def main():
+        semaphore = asyncio.Semaphore(max_concurrency)
+        robots = [make_robot(AsyncGPTRobot, BoundedLLM(CountingLLM(counts), semaphore=semaphore), seed) for seed in range(n_episodes)]
+        start = time.perf_counter()
+        answers = await asyncio.gather(*[run_episode(robot) for robot in robots])
+        return answers, time.perf_counter() - start
+    answers, elapsed = asyncio.run(main())
+    return answers, counts["peak"], elapsed
+
+def test_calls_in_flight_are_bounded():
+    answers, peak, _ = run_episodes(n_episodes=8, max_concurrency=3)
+    assert all(a[-1] == "finished" and len(a) == len(SCRIPT) for a in answers)
+    assert peak == 3
+
+def test_episodes_run_concurrently():
+    n_episodes = 8
+    _, peak, elapsed = run_episodes(n_episodes, max_concurrency=n_episodes)
+    # all the calls overlapped
+    assert peak == n_episodes
+    # about latency x turns, loosely bounded by half of latency x turns x episodes if they ran one after the other
+    assert elapsed < n_episodes * LATENCY_S * len(SCRIPT) / 2
+
+def test_sync_robot_gives_the_same_answers():
+    async_answers = asyncio.run(run_episode(make_robot(AsyncGPTRobot, StubLLM(SCRIPT))))
+    robot = make_robot(GPTRobot, StubLLM(SCRIPT))
+    sync_answers, answer = [], None
+    while answer != "finished":
+        answer = robot.next_action(answer)
+        sync_answers.append(answer)
+    assert sync_answers == async_answers
+    assert "Door_Room2 has been opened correctly" in sync_answers
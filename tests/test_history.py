@@ -0,0 +1,49 @@
+import os
+import itertools
+import numpy as np
+from omegaconf import OmegaConf
+
+from gym_env.utils.core import World
+from abstract_robot.gpt_robot import GPTRobot
+from abstract_robot.history import HistoryManager, count_tokens
+from abstract_robot.llm import StubLLM
+
+CONFIG = os.path.join(os.path.dirname(__file__), "..", "configs", "simple_room.yaml")
+# answers repeated over the episode, none of them ends it
+ANSWERS = ["EXPLORE()", "MOVETO(KeyA)", "PICKUP(KeyA)", "MOVETO(Door_Room1)", "PUTDOWN(KeyA)", "MOVETO(KeyB)"]
+
+class RecordingLLM(StubLLM):
+    # StubLLM keeping the messages of each call
+    def __init__(self, answers):
+        super().__init__(answers)
+        self.prompts = []
+
+    def _answer(self, messages):
+        self.prompts.append(list(messages))
+        return super()._answer(messages)
+
+def test_prompt_stays_bounded_over_100_turns():
+    n_turns = 100
+    np.random.seed(0)
+    world = World(100, 0, OmegaConf.load(CONFIG), fast_forward=True)
+    agent = world.agent
+    llm = RecordingLLM(list(itertools.islice(itertools.cycle(ANSWERS), n_turns)))
+    history = HistoryManager(summarize=world.summary)
+    robot = GPTRobot("put the table in room2", agent.explore, agent.pick, agent.goto, agent.drop, agent.open,
+                     lambda: "finished", llm=llm, history=history)
+
+    answer = None
+    for _ in range(n_turns):
+        answer = robot.next_action(answer)
+
+    assert len(llm.prompts) == n_turns
+    # the stub keeps following its script when old turns are folded
+    assert [m["content"] for m in robot.messages if m["role"] == "assistant"] == llm.answers
+    # without compaction the conversation would not fit
+    assert count_tokens(robot.messages) > history.token_budget
+    for prompt in llm.prompts:
+        assert count_tokens(prompt) <= history.token_budget
+        # system prompt and task always come first
+        assert prompt[:2] == robot.messages[:2]
+    # old turns are replaced by the summary of the world
+    assert "Summary of what happened so far" in llm.prompts[-1][2]["content"]